@@ -1,40 +1,41 @@
 #!/usr/bin/env python
 
-import configparser
 import click
+import contextlib
+import json
+import re
 import sys
+import time
 
 
-from appd_libs.appd_rest_api import AppdRestApi
-from appd_libs.appd_applications import AppdApplications
-from appd_libs.appd_dashboards import AppdDashboards
-from appd_libs.appd_healthrules import AppdHealthrules
-
-
-config = configparser.ConfigParser()
-config.read("config.ini")
-
-rest_api = AppdRestApi(
-    config.get("controller", "url"),
-    config.get("controller", "client_id"),
-    config.get("controller", "client_secret"),
+from appd_libs.appd_context import DEFAULT_CONTROLLER, AppdContext
+from appd_libs.appd_application_catalog import (
+    APPLICATION_NAME_MATCH_MODES,
+    AppdApplicationCatalog,
 )
-appd_internal_applications = {
-    "analytics_application_id": config.getint(
-        "applications", "analytics_application_id", fallback=0
-    ),
-    "db_mon_application": config.getint(
-        "applications", "db_mon_application", fallback=0
-    ),
-    "sim_application_id": config.getint(
-        "applications", "sim_application_id", fallback=0
-    ),
-}
-
-
-appd_applications = AppdApplications(rest_api)
-appd_dashboards = AppdDashboards(rest_api)
-appd_health_rules = AppdHealthrules(rest_api)
+from appd_libs.appd_dashboard_index import AppdDashboardUsageCollector
+from appd_libs.appd_metric_matcher import METRIC_MATCH_MODES
+from appd_libs.appd_output import OUTPUT_FORMATS, open_record_writer
+
+
+DASHBOARD_RECORD_FIELDS = [
+    "controller",
+    "application_id",
+    "application_name",
+    "dashboard_id",
+    "dashboard_name",
+    "widget_id",
+    "widget_title",
+    "metric",
+]
+HEALTHRULE_RECORD_FIELDS = [
+    "controller",
+    "application_id",
+    "application_name",
+    "healthrule_id",
+    "healthrule_name",
+    "criteria",
+]
 
 
 @click.command()
@@ -50,6 +51,13 @@ appd_health_rules = AppdHealthrules(rest_api)
     type=str,
     multiple=True,
 )
+@click.option(
+    "--app-name-match",
+    help="defines how to match application names",
+    type=click.Choice(APPLICATION_NAME_MATCH_MODES),
+    default="exact",
+    show_default=True,
+)
 @click.option(
     "--metric",
     help="search for this metric in dashboards",
@@ -59,53 +67,229 @@ appd_health_rules = AppdHealthrules(rest_api)
 @click.option(
     "--metric-match",
     help="defines how to match metrics",
-    type=click.Choice(["contains", "contains_case_sensitive", "exact", "regex"]),
+    type=click.Choice(METRIC_MATCH_MODES),
     default="contains",
     show_default=True,
 )
-def dashboards(app_id, app_name, metric, metric_match):
+@click.option(
+    "--parallelism",
+    help="number of dashboards loaded in parallel, defaults to controller:parallelism",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--async",
+    "use_async",
+    help="load dashboards with the asyncio client",
+    is_flag=True,
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    help="use the local response cache, defaults to cache:enabled",
+    default=None,
+)
+@click.option(
+    "--from-snapshot",
+    help="run offline on a snapshot file instead of the controller",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--stream",
+    help="load details while the dashboard list is still downloading",
+    is_flag=True,
+)
+@click.option(
+    "--output",
+    help="output format, json, jsonl and csv write one record per match",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="text",
+    show_default=True,
+)
+@click.option(
+    "--workers",
+    help="number of processes matching the dashboards, defaults to matching:workers",
+    type=click.IntRange(min=1),
+)
+@click.pass_obj
+def dashboards(
+    context: AppdContext,
+    app_id,
+    app_name,
+    app_name_match,
+    metric,
+    metric_match,
+    parallelism,
+    use_async,
+    use_cache,
+    from_snapshot,
+    stream,
+    output,
+    workers,
+):
     """This command checks AppD Dashboards for existing metrics"""
 
-    applications_to_check = get_applications_to_check(app_id, app_name)
+    writer = get_record_writer(output, DASHBOARD_RECORD_FIELDS)
+    controllers = get_controllers(context, from_snapshot)
+    results, failed = run_on_controllers(
+        controllers,
+        lambda controller: search_dashboards(
+            controller,
+            app_id,
+            app_name,
+            app_name_match,
+            metric,
+            metric_match,
+            parallelism,
+            use_async,
+            use_cache,
+            from_snapshot,
+            stream,
+            workers,
+            required=len(controllers) == 1,
+        ),
+    )
 
-    with click.progressbar(length=1, label="Load Dashboards") as bar:
-        dashboards = appd_dashboards.get_dashboards()
-        bar.update(1)
+    for controller, result in zip(controllers, results):
+        if result is None:
+            continue
+        applications_to_check, usage_collector, apis = result
+
+        with controller.stats.phase("print"):
+            if writer is not None:
+                for app in applications_to_check or [None]:
+                    write_dashboards_records(
+                        writer,
+                        usage_collector.get_dashboards_used_by_app(
+                            app["id"] if app is not None else None
+                        ),
+                        controller.controller,
+                        app,
+                    )
+            else:
+                if len(controllers) > 1:
+                    print_controller(controller)
+                if len(applications_to_check) > 0:
+                    for app in applications_to_check:
+                        dashboards_used = usage_collector.get_dashboards_used_by_app(
+                            app["id"]
+                        )
+                        app["dashboards_used"] = dashboards_used
+                    print_dashboards_applications(applications_to_check, metric)
+                else:
+                    print_dashboards_metrics(
+                        usage_collector.get_dashboards_used_by_app(), metric
+                    )
 
-    dashboards_details = []
-    with click.progressbar(dashboards, label="Load Dashboard details") as bar:
-        for dashboard in bar:
-            dashboards_details.append(appd_dashboards.get_dashboard(dashboard["id"]))
+        print_request_count(
+            *apis, controller=controller if len(controllers) > 1 else None
+        )
 
-    if len(applications_to_check) > 0:
-        with click.progressbar(
-            applications_to_check,
-            label=f"Check Dashboards for Applications{' and Metrics' if len(metric) > 0 else ''}",
-        ) as bar:
-            for app in bar:
-                app[
-                    "dashboards_used"
-                ] = appd_dashboards.get_dashboards_used_by_app_and_metric(
-                    dashboards_details,
-                    app["id"],
-                    metrics=metric,
-                    metric_match=metric_match,
+    if len(failed) > 0:
+        sys.exit(1)
+
+
+def search_dashboards(
+    context: AppdContext,
+    app_id,
+    app_name,
+    app_name_match,
+    metric,
+    metric_match,
+    parallelism,
+    use_async,
+    use_cache,
+    from_snapshot,
+    stream,
+    workers,
+    required=True,
+):
+    with context.stats.phase("load"):
+        applications_source, dashboards_source, _ = get_sources(context, from_snapshot)
+        applications_to_check = get_applications_to_check(
+            context,
+            app_id,
+            app_name,
+            applications_source=applications_source,
+            application_name_match=app_name_match,
+            required=required,
+        )
+
+        if parallelism is None:
+            parallelism = context.parallelism
+        if workers is None:
+            workers = context.config.getint("matching", "workers", fallback=1)
+        cache = (
+            get_response_cache(context, use_cache) if from_snapshot is None else None
+        )
+        dashboards_source.cache = cache
+
+        # without any of the requested applications, the metrics would be
+        # searched in all of them
+        applications_requested = len(app_id) > 0 or len(app_name) > 0
+        if len(applications_to_check) == 0 and (
+            applications_requested or len(metric) == 0
+        ):
+            if not required:
+                click.echo(
+                    f"{get_warn()} None of the applications is available", err=True
                 )
+                return None
+            click.echo(f"Neither application, nor metrics is set", err=True)
+            sys.exit(1)
+
+        # each dashboard is indexed as soon as its details arrive and then dropped
+        usage_collector = AppdDashboardUsageCollector(
+            [app["id"] for app in applications_to_check]
+            if len(applications_to_check) > 0
+            else [None],
+            metric,
+            metric_match,
+            workers=workers,
+            process_threshold=context.config.getint(
+                "matching", "process_threshold", fallback=2000
+            ),
+            stats=context.stats,
+        )
 
-        print_dashboards_applications(applications_to_check, metric)
+        apis = [context.rest_api] if from_snapshot is None else []
+        if use_async and from_snapshot is None:
+            import asyncio
 
-    elif len(metric) > 0:
-        with click.progressbar(length=1, label=f"Check Dashboards for Metrics") as bar:
-            dashboards_used = appd_dashboards.get_dashboards_used_by_app_and_metric(
-                dashboards_details, metrics=metric, metric_match=metric_match
+            async_rest_api = asyncio.run(
+                load_dashboards_async(
+                    context, parallelism, usage_collector.add_dashboard, cache
+                )
             )
-            bar.update(1)
+            apis.append(async_rest_api)
+        elif stream:
+            with click.progressbar(
+                dashboards_source.get_dashboards(stream=True),
+                label="Load and check Dashboards",
+                show_pos=True,
+            ) as bar:
+                for position, _, details in dashboards_source.iter_dashboards_details(
+                    bar, parallelism
+                ):
+                    usage_collector.add_dashboard(position, details)
+        else:
+            with click.progressbar(length=1, label="Load Dashboards") as bar:
+                dashboards = dashboards_source.get_dashboards()
+                bar.update(1)
+
+            with click.progressbar(
+                length=len(dashboards), label="Load and check Dashboards"
+            ) as bar:
+                for position, _, details in dashboards_source.iter_dashboards_details(
+                    dashboards, parallelism
+                ):
+                    usage_collector.add_dashboard(position, details)
+                    bar.update(1)
 
-        print_dashboards_metrics(dashboards_used, metric)
+        if cache is not None:
+            cache.evict()
 
-    else:
-        click.echo(f"Neither application, nor metrics is set", err=True)
-        sys.exit(1)
+    usage_collector.finish()
+    return applications_to_check, usage_collector, apis
 
 
 @click.command()
@@ -121,6 +305,13 @@ def dashboards(app_id, app_name, metric, metric_match):
     type=str,
     multiple=True,
 )
+@click.option(
+    "--app-name-match",
+    help="defines how to match application names",
+    type=click.Choice(APPLICATION_NAME_MATCH_MODES),
+    default="exact",
+    show_default=True,
+)
 @click.option(
     "--metric",
     help="search for this metric in healthrules",
@@ -131,66 +322,236 @@ def dashboards(app_id, app_name, metric, metric_match):
 @click.option(
     "--metric-match",
     help="defines how to match metrics",
-    type=click.Choice(["contains", "contains_case_sensitive", "exact", "regex"]),
+    type=click.Choice(METRIC_MATCH_MODES),
     default="contains",
     show_default=True,
 )
-def healthrules(app_id, app_name, metric, metric_match):
+@click.option(
+    "--parallelism",
+    help="number of requests sent in parallel, defaults to controller:parallelism",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--parallelism-per-app",
+    help="number of requests sent in parallel for one application, defaults to controller:parallelism_per_application",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--async",
+    "use_async",
+    help="load healthrules with the asyncio client",
+    is_flag=True,
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    help="use the local response cache, defaults to cache:enabled",
+    default=None,
+)
+@click.option(
+    "--from-snapshot",
+    help="run offline on a snapshot file instead of the controller",
+    type=click.Path(exists=True, dir_okay=False),
+)
+@click.option(
+    "--stream",
+    help="parse the healthrule lists while they are still downloading",
+    is_flag=True,
+)
+@click.option(
+    "--output",
+    help="output format, json, jsonl and csv write one record per match",
+    type=click.Choice(OUTPUT_FORMATS),
+    default="text",
+    show_default=True,
+)
+@click.option(
+    "--incremental/--no-incremental",
+    "use_incremental",
+    help="only load new and changed healthrules, defaults to incremental:enabled",
+    default=None,
+)
+@click.pass_obj
+def healthrules(
+    context: AppdContext,
+    app_id,
+    app_name,
+    app_name_match,
+    metric,
+    metric_match,
+    parallelism,
+    parallelism_per_app,
+    use_async,
+    use_cache,
+    from_snapshot,
+    stream,
+    output,
+    use_incremental,
+):
     """This command checks AppD Dashboards for existing metrics"""
 
-    applications_to_check = get_applications_to_check(app_id, app_name, True)
+    writer = get_record_writer(output, HEALTHRULE_RECORD_FIELDS)
+    controllers = get_controllers(context, from_snapshot)
+    results, failed = run_on_controllers(
+        controllers,
+        lambda controller: search_healthrules(
+            controller,
+            app_id,
+            app_name,
+            app_name_match,
+            metric,
+            metric_match,
+            parallelism,
+            parallelism_per_app,
+            use_async,
+            use_cache,
+            from_snapshot,
+            stream,
+            use_incremental,
+            required=len(controllers) == 1,
+            # a single controller writes the records of each matched application
+            # right away
+            writer=writer if len(controllers) == 1 else None,
+        ),
+    )
 
-    with click.progressbar(
-        applications_to_check,
-        label=f"Load HealthRules for Application",
-    ) as bar:
-        for app in bar:
-            app["healthrules"] = appd_health_rules.get_healthrules(app["id"])
+    for controller, result in zip(controllers, results):
+        if result is None:
+            continue
+        applications_to_check, apis = result
 
-    for app in applications_to_check:
-        with click.progressbar(
-            app["healthrules"],
-            label=f"Load HealthRules Details for Application {app['name']}",
-        ) as bar2:
-            for healthrule in bar2:
-                healthrule["details"] = appd_health_rules.get_healthrule(
-                    app["id"], healthrule["id"]
+        with controller.stats.phase("print"):
+            if writer is not None:
+                if len(controllers) > 1:
+                    for app in applications_to_check:
+                        write_healthrules_records(writer, controller.controller, app)
+            else:
+                if len(controllers) > 1:
+                    print_controller(controller)
+                print_healthrules_applications(applications_to_check, metric)
+
+        print_request_count(
+            *apis, controller=controller if len(controllers) > 1 else None
+        )
+
+    if len(failed) > 0:
+        sys.exit(1)
+
+
+def search_healthrules(
+    context: AppdContext,
+    app_id,
+    app_name,
+    app_name_match,
+    metric,
+    metric_match,
+    parallelism,
+    parallelism_per_app,
+    use_async,
+    use_cache,
+    from_snapshot,
+    stream,
+    use_incremental,
+    required=True,
+    writer=None,
+):
+    with context.stats.phase("load"):
+        applications_source, _, healthrules_source = get_sources(context, from_snapshot)
+        applications_to_check = get_applications_to_check(
+            context,
+            app_id,
+            app_name,
+            True,
+            applications_source=applications_source,
+            application_name_match=app_name_match,
+            required=required,
+        )
+
+        if parallelism is None:
+            parallelism = context.parallelism
+        if parallelism_per_app is None:
+            parallelism_per_app = context.config.getint(
+                context.controller_section,
+                "parallelism_per_application",
+                fallback=parallelism,
+            )
+        cache = (
+            get_response_cache(context, use_cache) if from_snapshot is None else None
+        )
+        healthrules_source.cache = cache
+        store = get_healthrule_store(
+            context,
+            use_incremental,
+            supported=not use_async and from_snapshot is None,
+        )
+        healthrules_source.store = store
+
+        apis = [context.rest_api] if from_snapshot is None else []
+        if use_async and from_snapshot is None:
+            import asyncio
+
+            async_rest_api = asyncio.run(
+                load_healthrules_async(
+                    context,
+                    applications_to_check,
+                    parallelism,
+                    parallelism_per_app,
+                    cache,
                 )
-                if (
-                    "id" in healthrule["details"]
-                    and "name" in healthrule["details"]
-                    and "evalCriterias" in healthrule["details"]
+            )
+            apis.append(async_rest_api)
+            for app in applications_to_check:
+                for healthrule in app["healthrules"]:
+                    check_healthrule_json(app, healthrule)
+        else:
+            with click.progressbar(
+                length=len(applications_to_check),
+                label="Load HealthRules and Details for Application",
+                show_pos=True,
+                item_show_func=lambda app: app["name"] if app is not None else None,
+            ) as bar:
+                for app in healthrules_source.iter_healthrules_details(
+                    applications_to_check, parallelism, parallelism_per_app, stream
                 ):
-                    healthrule["json_valid"] = True
-                else:
-                    click.echo(
-                        f'{get_error()}JSON for healthrule {healthrule["name"]}:[{healthrule["id"]}] in application {app["name"]}[id:{app["id"]}] is not valid',
-                        err=True,
+                    for healthrule in app["healthrules"]:
+                        check_healthrule_json(app, healthrule)
+                    bar.update(1, app)
+
+        if cache is not None:
+            cache.evict()
+
+    with context.stats.phase("match"):
+        for app in applications_to_check:
+            app["match"] = False
+            for healthrule in app["healthrules"]:
+                if healthrule["json_valid"]:
+                    healthrule["match"] = healthrules_source.get_healthrule_match(
+                        app, healthrule, metric, metric_match
                     )
-                    healthrule["json_valid"] = False
-
-    for app in applications_to_check:
-        app["match"] = False
-        for healthrule in app["healthrules"]:
-            if healthrule["json_valid"]:
-                healthrule["match"] = appd_health_rules.check_healthrule_by_metrics(
-                    app, healthrule["details"], metric, metric_match
-                )
-                if (
-                    healthrule["match"]["criticalCriteria"]
-                    or healthrule["match"]["warningCriteria"]
-                    or healthrule["match"]["informationPoint"]
-                ):
-                    app["match"] = True
-            else:
-                healthrule["match"] = None
-    applications_mached = [app for app in applications_to_check if app["match"]]
+                    if (
+                        healthrule["match"]["criticalCriteria"]
+                        or healthrule["match"]["warningCriteria"]
+                        or healthrule["match"]["informationPoint"]
+                    ):
+                        app["match"] = True
+                else:
+                    healthrule["match"] = None
+            if store is not None:
+                store.save_application(app["id"], app["healthrules"])
+            if writer is not None:
+                with context.stats.phase("print"):
+                    write_healthrules_records(writer, context.controller, app)
+
+    return applications_to_check, apis
+
 
+def print_healthrules_applications(applications, metrics):
+    applications_mached = [app for app in applications if app["match"]]
     click.echo(
-        f"Metrics {get_header_style(list(metric))} are used in {get_count_style(applications_mached)} Healthrules"
+        f"Metrics {get_header_style(list(metrics))} are used in {get_count_style(applications_mached)} Healthrules"
     )
 
-    for app in applications_to_check:
+    for app in applications:
         if app["match"]:
             click.echo(f"\tApplication: {get_header_style(app['name'])} [{app['id']}]")
             for healthrule in app["healthrules"]:
@@ -209,51 +570,351 @@ def healthrules(app_id, app_name, metric, metric_match):
                         )
 
 
-@click.group()
-def group():
-    pass
+def get_record_writer(output, fields):
+    if output == "text":
+        return None
 
+    # the writer owns stdout, progress bars and messages go to stderr
+    ctx = click.get_current_context()
+    writer = ctx.with_resource(open_record_writer(output, fields))
+    ctx.with_resource(contextlib.redirect_stdout(sys.stderr))
+    return writer
 
-group.add_command(dashboards)
-group.add_command(healthrules)
 
+def write_dashboards_records(writer, dashboards, controller, app=None):
+    for dashboard in dashboards:
+        for widget in dashboard["widgets"]:
+            for metric in widget["metrics"] or [None]:
+                writer.write(
+                    {
+                        "controller": controller,
+                        "application_id": app["id"] if app is not None else None,
+                        "application_name": app["name"] if app is not None else None,
+                        "dashboard_id": dashboard["id"],
+                        "dashboard_name": dashboard["name"],
+                        "widget_id": widget["id"],
+                        "widget_title": widget["title"],
+                        "metric": metric,
+                    }
+                )
 
-def get_applications_to_check(
-    application_ids, application_names, fallback_all: bool = False
+
+def write_healthrules_records(writer, controller, app):
+    for healthrule in app["healthrules"]:
+        if healthrule["match"]:
+            for criteria in ["criticalCriteria", "warningCriteria", "informationPoint"]:
+                if healthrule["match"][criteria]:
+                    writer.write(
+                        {
+                            "controller": controller,
+                            "application_id": app["id"],
+                            "application_name": app["name"],
+                            "healthrule_id": healthrule["id"],
+                            "healthrule_name": healthrule["name"],
+                            "criteria": criteria,
+                        }
+                    )
+
+
+def check_healthrule_json(app, healthrule):
+    if (
+        "id" in healthrule["details"]
+        and "name" in healthrule["details"]
+        and "evalCriterias" in healthrule["details"]
+    ):
+        healthrule["json_valid"] = True
+    else:
+        click.echo(
+            f'{get_error()}JSON for healthrule {healthrule["name"]}:[{healthrule["id"]}] in application {app["name"]}[id:{app["id"]}] is not valid',
+            err=True,
+        )
+        healthrule["json_valid"] = False
+
+
+async def load_dashboards_async(
+    context: AppdContext, parallelism, on_loaded, cache=None
 ):
-    all_apps = appd_applications.get_applications()
+    # aiohttp is only required for --async
+    from appd_libs.appd_async import (
+        AppdAsyncRestApi,
+        AppdAsyncDashboards,
+        gather_bounded,
+    )
+
+    async with AppdAsyncRestApi(
+        **context.rest_api_settings, rate_limiter=context.rate_limiter
+    ) as async_rest_api:
+        async_dashboards = AppdAsyncDashboards(async_rest_api, cache)
 
-    if appd_internal_applications["analytics_application_id"] != 0:
-        all_apps.append(
-            appd_applications.get_application(
-                appd_internal_applications["analytics_application_id"]
+        with click.progressbar(length=1, label="Load Dashboards") as bar:
+            dashboards = await async_dashboards.get_dashboards()
+            bar.update(1)
+
+        with click.progressbar(
+            length=len(dashboards), label="Load and check Dashboards"
+        ) as bar:
+
+            async def load_dashboard(position_and_dashboard):
+                position, dashboard = position_and_dashboard
+                on_loaded(position, await async_dashboards.load_dashboard(dashboard))
+                bar.update(1)
+
+            await gather_bounded(
+                load_dashboard, list(enumerate(dashboards)), parallelism
             )
-        )
 
-    if appd_internal_applications["db_mon_application"] != 0:
-        all_apps.append(
-            appd_applications.get_application(
-                appd_internal_applications["db_mon_application"]
+    return async_rest_api
+
+
+async def load_healthrules_async(
+    context: AppdContext, applications, parallelism, parallelism_per_app, cache=None
+):
+    # aiohttp is only required for --async
+    from appd_libs.appd_async import (
+        AppdAsyncRestApi,
+        AppdAsyncHealthrules,
+        gather_bounded,
+    )
+
+    async with AppdAsyncRestApi(
+        **context.rest_api_settings, rate_limiter=context.rate_limiter
+    ) as async_rest_api:
+        async_health_rules = AppdAsyncHealthrules(async_rest_api, cache)
+
+        async def load_healthrules(app):
+            app["healthrules"] = await async_health_rules.get_healthrules(app["id"])
+
+        with click.progressbar(
+            length=len(applications), label=f"Load HealthRules for Application"
+        ) as bar:
+            await gather_bounded(
+                load_healthrules,
+                applications,
+                parallelism,
+                on_done=lambda app, result: bar.update(1),
             )
+
+        async def load_healthrule(app_and_healthrule):
+            app, healthrule = app_and_healthrule
+            healthrule["details"] = await async_health_rules.load_healthrule(
+                app["id"], healthrule["id"]
+            )
+
+        healthrules = [
+            (app, healthrule)
+            for app in applications
+            for healthrule in app["healthrules"]
+        ]
+        with click.progressbar(
+            length=len(healthrules), label="Load HealthRules Details"
+        ) as bar:
+            await gather_bounded(
+                load_healthrule,
+                healthrules,
+                parallelism,
+                on_done=lambda app_and_healthrule, result: bar.update(1),
+                key=lambda app_and_healthrule: app_and_healthrule[0]["id"],
+                parallelism_per_key=parallelism_per_app,
+            )
+
+    return async_rest_api
+
+
+@click.command()
+@click.argument("path", type=click.Path(dir_okay=False, writable=True))
+@click.option(
+    "--parallelism",
+    help="number of requests sent in parallel, defaults to controller:parallelism",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--cache/--no-cache",
+    "use_cache",
+    help="use the local response cache, defaults to cache:enabled",
+    default=None,
+)
+@click.pass_obj
+def snapshot(context: AppdContext, path, parallelism, use_cache):
+    """This command stores applications, dashboards and healthrules in a snapshot file"""
+
+    controllers = get_controllers(context)
+    if len(controllers) > 1:
+        raise click.UsageError("snapshot stores a single controller")
+    context = controllers[0]
+
+    if parallelism is None:
+        parallelism = context.parallelism
+    from appd_libs.appd_concurrency import map_ordered
+    from appd_libs.appd_snapshot import AppdSnapshot
+
+    appd_applications = context.applications
+    appd_dashboards = context.dashboards
+    appd_health_rules = context.healthrules
+    cache = get_response_cache(context, use_cache)
+    appd_dashboards.cache = cache
+    appd_health_rules.cache = cache
+
+    appd_snapshot = AppdSnapshot(controller_url=context.rest_api.controller_url)
+
+    with click.progressbar(length=1, label="Load Application data") as bar:
+        (
+            appd_snapshot.applications,
+            appd_snapshot.internal_applications,
+        ) = appd_applications.get_applications_and_internal(
+            context.internal_application_ids
+        )
+        bar.update(1)
+
+    with click.progressbar(length=1, label="Load Dashboards") as bar:
+        appd_snapshot.dashboards = appd_dashboards.get_dashboards()
+        bar.update(1)
+
+    with click.progressbar(
+        length=len(appd_snapshot.dashboards), label="Load Dashboard details"
+    ) as bar:
+        appd_snapshot.dashboards_details = appd_dashboards.get_dashboards_details(
+            appd_snapshot.dashboards,
+            parallelism,
+            on_loaded=lambda dashboard, details: bar.update(1),
+        )
+
+    applications = appd_snapshot.applications + appd_snapshot.internal_applications
+    with click.progressbar(
+        applications, label=f"Load HealthRules for Application"
+    ) as bar:
+        for app in bar:
+            appd_snapshot.healthrules[
+                str(app["id"])
+            ] = appd_health_rules.get_healthrules(app["id"])
+
+    healthrules = [
+        (app["id"], healthrule["id"])
+        for app in applications
+        for healthrule in appd_snapshot.healthrules[str(app["id"])]
+    ]
+    with click.progressbar(
+        length=len(healthrules), label="Load HealthRules Details"
+    ) as bar:
+        healthrules_details = map_ordered(
+            lambda ids: appd_health_rules.load_healthrule(*ids),
+            healthrules,
+            parallelism,
+            on_done=lambda ids, details: bar.update(1),
         )
+    appd_snapshot.healthrules_details = {
+        f"{app_id}/{healthrule_id}": details
+        for (app_id, healthrule_id), details in zip(healthrules, healthrules_details)
+    }
+
+    if cache is not None:
+        cache.evict()
+
+    appd_snapshot.save(path)
+    click.echo(
+        f"{get_info()} Stored {len(applications)} Applications, {len(appd_snapshot.dashboards)} Dashboards and {len(healthrules)} HealthRules in {path}"
+    )
+    print_request_count(context.rest_api)
+
+
+@click.group("cache")
+def cache_group():
+    """This command manages the local response cache"""
+
+
+@cache_group.command()
+@click.option(
+    "--incremental",
+    "clear_incremental",
+    help="also remove the stored healthrules of incremental scans",
+    is_flag=True,
+)
+@click.pass_obj
+def clear(context: AppdContext, clear_incremental):
+    """This command removes all cached responses of the controller"""
+
+    for controller in get_controllers(context):
+        controller.response_cache.clear()
+        click.echo(f"{get_info()} Cleared cache {controller.response_cache.directory}")
+        if controller.internal_applications_cache is not None:
+            controller.internal_applications_cache.clear()
+        if clear_incremental:
+            controller.healthrule_store.clear()
+            click.echo(
+                f"{get_info()} Cleared healthrule store {controller.healthrule_store.directory}"
+            )
 
-    if appd_internal_applications["sim_application_id"] != 0:
-        all_apps.append(
-            appd_applications.get_application(
-                appd_internal_applications["sim_application_id"]
+
+@click.group()
+@click.option(
+    "--controller",
+    "controller_names",
+    help="run on the controller of section controller:<name>, more than one runs them all at once",
+    type=str,
+    multiple=True,
+)
+@click.option(
+    "--all-controllers",
+    help="run on all configured controllers at once",
+    is_flag=True,
+)
+@click.option(
+    "--stats",
+    "print_stats",
+    help="print latency percentiles and throughput of the requests and the time of each phase",
+    is_flag=True,
+)
+@click.option(
+    "--stats-json",
+    help="write the stats and every request to this file",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.pass_context
+def group(ctx, controller_names, all_controllers, print_stats, stats_json):
+    context = ctx.ensure_object(AppdContext)
+    context.controller_names = list(controller_names)
+    context.all_controllers = all_controllers
+    if print_stats or stats_json is not None:
+        # also reported when the command exits with an error
+        ctx.call_on_close(
+            lambda: report_stats(
+                context, ctx.invoked_subcommand, print_stats, stats_json
             )
         )
 
+
+group.add_command(dashboards)
+group.add_command(healthrules)
+group.add_command(snapshot)
+group.add_command(cache_group)
+
+
+def get_applications_to_check(
+    context: AppdContext,
+    application_ids,
+    application_names,
+    fallback_all: bool = False,
+    applications_source=None,
+    application_name_match: str = "exact",
+    required: bool = True,
+):
+    if applications_source is None:
+        applications_source = context.applications
+    all_apps, internal_apps = applications_source.get_applications_and_internal(
+        context.internal_application_ids
+    )
+    all_apps += internal_apps
+
     with click.progressbar(length=1, label="Load Application data") as bar:
         all_apps
         bar.update(1)
 
     if len(application_ids) > 0 or len(application_names) > 0:
+        catalog = AppdApplicationCatalog(all_apps)
         applications_to_check = get_applications_to_check_by_id(
-            application_ids, all_apps
+            application_ids, catalog, required
         )
         applications_to_check += get_applications_to_check_by_name(
-            application_names, all_apps
+            application_names, catalog, application_name_match, required
         )
 
         return list({i["id"]: i for i in applications_to_check}.values())
@@ -264,7 +925,9 @@ def get_applications_to_check(
         return []
 
 
-def get_applications_to_check_by_id(application_ids, available_applications):
+def get_applications_to_check_by_id(
+    application_ids, catalog: AppdApplicationCatalog, required: bool = True
+):
     applications_to_check = []
 
     if len(application_ids) > 0:
@@ -272,30 +935,32 @@ def get_applications_to_check_by_id(application_ids, available_applications):
 
         with click.progressbar(application_ids, label="Load Application Ids") as bar:
             for app_id in bar:
-                app_name = next(
-                    (
-                        item["name"]
-                        for item in available_applications
-                        if item["id"] == app_id
-                    ),
-                    None,
-                )
-                if app_name is None:
+                application = catalog.get_by_id(app_id)
+                if application is None:
                     app_id_style = click.style(app_id, bold=True, fg="red")
                     click.echo(
                         f"Application Id {app_id_style} is not available", err=True
                     )
+                    # with several controllers an application may exist on
+                    # some of them only
+                    if not required:
+                        continue
                     sys.exit(1)
                 applications_to_check.append(
                     {
                         "id": app_id,
-                        "name": app_name,
+                        "name": application["name"],
                     }
                 )
     return applications_to_check
 
 
-def get_applications_to_check_by_name(application_names, available_applications):
+def get_applications_to_check_by_name(
+    application_names,
+    catalog: AppdApplicationCatalog,
+    application_name_match: str = "exact",
+    required: bool = True,
+):
     applications_to_check = []
 
     if len(application_names) > 0:
@@ -305,23 +970,32 @@ def get_applications_to_check_by_name(application_names, available_applications)
             application_names, label="Load Application Names"
         ) as bar:
             for app_name in bar:
-                app_id = next(
-                    (i["id"] for i in available_applications if i["name"] == app_name),
-                    None,
-                )
-                if app_id is None:
+                try:
+                    applications = catalog.select_by_name(
+                        app_name, application_name_match
+                    )
+                except re.error as e:
+                    click.echo(
+                        f"{get_error()}Invalid application name pattern {app_name}: {e}",
+                        err=True,
+                    )
+                    sys.exit(1)
+                if len(applications) == 0:
                     app_name_style = click.style(app_name, bold=True, fg="red")
                     click.echo(
                         f"Application Name {app_name_style} is not available",
                         err=True,
                     )
+                    if not required:
+                        continue
                     sys.exit(1)
-                applications_to_check.append(
+                applications_to_check += [
                     {
-                        "id": app_id,
-                        "name": app_name,
+                        "id": application["id"],
+                        "name": application["name"],
                     }
-                )
+                    for application in applications
+                ]
 
     return applications_to_check
 
@@ -383,6 +1057,188 @@ def print_dashboard_metrics(metrics):
         click.echo(f"\t\t\tMetric: {matched_metric_style}")
 
 
+def get_sources(context: AppdContext, from_snapshot):
+    if from_snapshot is None:
+        return context.applications, context.dashboards, context.healthrules
+
+    from appd_libs.appd_snapshot import (
+        AppdSnapshot,
+        AppdSnapshotApplications,
+        AppdSnapshotDashboards,
+        AppdSnapshotHealthrules,
+    )
+
+    appd_snapshot = AppdSnapshot.load(from_snapshot)
+    click.echo(
+        f"{get_info()} Using snapshot of {appd_snapshot.controller_url} from {time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(appd_snapshot.created_at))}",
+        err=True,
+    )
+    return (
+        AppdSnapshotApplications(appd_snapshot),
+        AppdSnapshotDashboards(appd_snapshot),
+        AppdSnapshotHealthrules(appd_snapshot),
+    )
+
+
+def get_controllers(context: AppdContext, from_snapshot=None):
+    controllers = context.controllers
+    configured = context.get_controller_names()
+    for controller in controllers:
+        if (
+            controller.controller != DEFAULT_CONTROLLER
+            and controller.controller not in configured
+        ):
+            raise click.UsageError(
+                f"Controller {controller.controller} is not configured, add a [controller:{controller.controller}] section"
+            )
+    if len(controllers) == 0:
+        raise click.UsageError("No controller is configured")
+    if len(controllers) > 1 and from_snapshot is not None:
+        raise click.UsageError("--from-snapshot runs on a single controller")
+    return controllers
+
+
+def run_on_controllers(controllers: list, function):
+    # returns the results in the order of the controllers and the failed ones,
+    # the report of the others is still complete
+    if len(controllers) == 1:
+        return [function(controllers[0])], []
+
+    from appd_libs.appd_fan_out import fan_out
+
+    click.echo(
+        f"{get_info()} Running on controllers {', '.join(controller.controller for controller in controllers)}",
+        err=True,
+    )
+    results, failed = [], []
+    for controller, (result, error) in zip(controllers, fan_out(function, controllers)):
+        if error is not None:
+            click.echo(
+                f"{get_error()}Controller {controller.controller} failed: {error}",
+                err=True,
+            )
+            failed.append(controller)
+        results.append(result)
+    return results, failed
+
+
+def get_response_cache(context: AppdContext, use_cache):
+    if use_cache is None:
+        use_cache = context.config.getboolean("cache", "enabled", fallback=False)
+    return context.response_cache if use_cache else None
+
+
+def get_healthrule_store(context: AppdContext, use_incremental, supported=True):
+    if use_incremental is None:
+        use_incremental = context.config.getboolean(
+            "incremental", "enabled", fallback=False
+        )
+    if not use_incremental:
+        return None
+    # checked before the store is built, it needs the controller url
+    if not supported:
+        click.echo(
+            f"{get_warn()} Incremental scan is not supported with --async or --from-snapshot",
+            err=True,
+        )
+        return None
+    return context.healthrule_store
+
+
+def print_request_count(*apis, controller: AppdContext = None):
+    request_count = sum(api.request_count for api in apis)
+    click.echo(
+        f"{get_info()} {request_count} requests sent to the controller"
+        + (f" {controller.controller}" if controller is not None else ""),
+        err=True,
+    )
+    # the clients of a controller share one limiter
+    rate_limiters = []
+    for api in apis:
+        rate_limiter = getattr(api, "rate_limiter", None)
+        if rate_limiter is not None and rate_limiter not in rate_limiters:
+            rate_limiters.append(rate_limiter)
+    for rate_limiter in rate_limiters:
+        print_rate_limiter(rate_limiter, controller)
+
+
+def print_rate_limiter(rate_limiter, controller: AppdContext = None):
+    rate_limit = (
+        f"{rate_limiter.rate:.1f} requests/s"
+        if rate_limiter.rate is not None
+        else "none"
+    )
+    click.echo(
+        f"{get_info()} Rate limit"
+        + (f" of {controller.controller}" if controller is not None else "")
+        + f" {rate_limit}, concurrency {int(rate_limiter.concurrency)}, {rate_limiter.backoff_count} back offs, {rate_limiter.get_average_rate():.1f} requests/s sent",
+        err=True,
+    )
+
+
+def report_stats(context: AppdContext, command, print_stats, stats_json):
+    controllers = context.controllers
+    if print_stats:
+        for controller in controllers:
+            print_controller_stats(
+                controller.stats, controller if len(controllers) > 1 else None
+            )
+
+    if stats_json is not None:
+        with open(stats_json, "w") as file:
+            json.dump(
+                {
+                    "command": command,
+                    "controllers": {
+                        controller.controller: {
+                            # offline runs on a snapshot need no controller section
+                            "url": controller.config.get(
+                                controller.controller_section, "url", fallback=None
+                            ),
+                            **controller.stats.to_json(),
+                        }
+                        for controller in controllers
+                    },
+                },
+                file,
+            )
+        click.echo(f"{get_info()} Stored stats in {stats_json}", err=True)
+
+
+def print_controller_stats(stats, controller: AppdContext = None):
+    summary = stats.get_request_summary()
+    phases = stats.get_phases()
+    if len(summary) == 0 and len(phases) == 0:
+        return
+
+    click.echo(
+        f"{get_info()} Requests"
+        + (f" of {controller.controller}" if controller is not None else "")
+        + f" in {stats.get_duration():.2f} s",
+        err=True,
+    )
+    click.echo(
+        f"\t{'endpoint':<18} {'count':>6} {'errors':>6} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'req/s':>8} {'KiB':>9}",
+        err=True,
+    )
+    for family, requests in summary.items():
+        click.echo(
+            f"\t{family:<18} {requests['count']:>6} {requests['errors']:>6} {requests['p50'] * 1000:>8.1f} {requests['p95'] * 1000:>8.1f} {requests['p99'] * 1000:>8.1f} {requests['throughput']:>8.1f} {requests['bytes'] / 1024:>9.1f}",
+            err=True,
+        )
+    click.echo(
+        f"{get_info()} Phases: "
+        + ", ".join(f"{phase} {duration:.2f} s" for phase, duration in phases.items()),
+        err=True,
+    )
+
+
+def print_controller(controller: AppdContext):
+    click.echo(
+        f"Controller {get_header_style(controller.controller)} [{controller.controller_url}]"
+    )
+
+
 def get_count_style(elements):
     elements_count = len(elements)
     return click.style(
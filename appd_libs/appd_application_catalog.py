@@ -0,0 +1,80 @@
+import bisect
+import fnmatch
+import logging
+import re
+
+APPLICATION_NAME_MATCH_MODES = ["exact", "ignore_case", "glob", "regex"]
+
+
+class AppdApplicationCatalog:
+    def __init__(self, applications: list):
+        self.applications = []
+        self.__by_id = {}
+        self.__positions = {}
+        self.__by_name = {}  # name -> applications, in catalog order
+        self.__by_folded_name = {}
+        self.__sorted_names = None
+
+        for application in applications:
+            self.add_application(application)
+
+    def add_application(self, application: dict):
+        # the first application with an id wins, like the linear search did
+        if application["id"] in self.__by_id:
+            return
+        self.__positions[application["id"]] = len(self.applications)
+        self.applications.append(application)
+        self.__by_id[application["id"]] = application
+        self.__by_name.setdefault(application["name"], []).append(application)
+        self.__by_folded_name.setdefault(application["name"].casefold(), []).append(
+            application
+        )
+        self.__sorted_names = None
+
+    def get_by_id(self, id: int):
+        return self.__by_id.get(id)
+
+    def get_by_name(self, name: str):
+        applications = self.__by_name.get(name)
+        return None if applications is None else applications[0]
+
+    def select_by_name(self, name: str, name_match: str = "exact"):
+        if name_match == "exact":
+            application = self.get_by_name(name)
+            return [] if application is None else [application]
+        elif name_match == "ignore_case":
+            return list(self.__by_folded_name.get(name.casefold(), []))
+        elif name_match == "glob":
+            return self.__select_names(
+                self.__get_glob_names(name), re.compile(fnmatch.translate(name))
+            )
+        elif name_match == "regex":
+            return self.__select_names(self.__by_name, re.compile(name))
+        else:
+            logging.error(f"Unknown application name match {name_match}")
+            raise ValueError("Invalid application name match")
+
+    def __get_glob_names(self, pattern: str):
+        if self.__sorted_names is None:
+            self.__sorted_names = sorted(self.__by_name)
+
+        # only names starting with the literal prefix of the pattern can match
+        prefix = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+        start = bisect.bisect_left(self.__sorted_names, prefix)
+        end = start
+        while end < len(self.__sorted_names) and self.__sorted_names[end].startswith(
+            prefix
+        ):
+            end += 1
+        return self.__sorted_names[start:end]
+
+    def __select_names(self, names, regex: re.Pattern):
+        selected = [
+            application
+            for name in names
+            if regex.match(name)
+            for application in self.__by_name[name]
+        ]
+        return sorted(
+            selected, key=lambda application: self.__positions[application["id"]]
+        )
@@ -1,10 +1,45 @@
+from .appd_cache import AppdCache
+from .appd_concurrency import map_ordered
 from .appd_rest_api import AppdRestApi
 import logging
 
 
 class AppdApplications:
-    def __init__(self, appd_rest_api: AppdRestApi):
+    def __init__(self, appd_rest_api: AppdRestApi, cache: AppdCache = None):
         self.appd_rest_api: AppdRestApi = appd_rest_api
+        self.cache: AppdCache = cache
+
+    def get_applications_and_internal(self, internal_application_ids: list):
+        # the internal applications are not part of the application list, the
+        # missing ones are loaded while the list is still downloading
+        internal_applications = {}
+        for id in internal_application_ids:
+            if id != 0:
+                internal_applications[id] = self.get_cached_application(id)
+        missing_ids = [id for id, app in internal_applications.items() if app is None]
+
+        results = map_ordered(
+            lambda id: self.get_applications()
+            if id is None
+            else self.get_application(id),
+            [None] + missing_ids,
+            parallelism=1 + len(missing_ids),
+        )
+        for id, application in zip(missing_ids, results[1:]):
+            internal_applications[id] = application
+            self.store_cached_application(id, application)
+
+        return results[0], list(internal_applications.values())
+
+    def get_cached_application(self, id: int):
+        if self.cache is None:
+            return None
+        cached = self.cache.get("application", id)
+        return cached["data"] if cached is not None else None
+
+    def store_cached_application(self, id: int, application: dict):
+        if self.cache is not None:
+            self.cache.put("application", id, application)
 
     def get_applications(self):
         url = f"/controller/rest/applications?output=JSON"
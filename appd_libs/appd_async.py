@@ -0,0 +1,396 @@
+import asyncio
+import contextlib
+import email.utils
+import json as jsonlib
+import logging
+import random
+import ssl
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import aiohttp
+
+from .appd_cache import AppdCache
+from .appd_dashboards import AppdDashboardCache
+from .appd_healthrules import AppdHealthruleCache
+from .appd_rate_limiter import AppdRateLimiter
+from .appd_rest_api import RETRY_STATUS_CODES
+from .appd_stats import AppdStats
+from .appd_token_cache import AppdTokenCache
+
+
+async def gather_bounded(
+    function,
+    items,
+    parallelism: int = 1,
+    on_done=None,
+    key=None,
+    parallelism_per_key: int = None,
+):
+    semaphore = asyncio.Semaphore(parallelism)
+    key_semaphores = {}
+
+    async def run(item):
+        # the slot of the key is taken first, so items waiting for their key
+        # don't hold the slots other keys could use
+        key_semaphore = contextlib.nullcontext()
+        if key is not None and parallelism_per_key is not None:
+            key_semaphore = key_semaphores.setdefault(
+                key(item), asyncio.Semaphore(parallelism_per_key)
+            )
+        async with key_semaphore, semaphore:
+            result = await function(item)
+        if on_done is not None:
+            on_done(item, result)
+        return result
+
+    return await asyncio.gather(*(run(item) for item in items))
+
+
+class AppdAsyncResponse:
+    def __init__(self, status_code: int, headers, content: bytes):
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8", errors="replace")
+
+    def json(self):
+        return jsonlib.loads(self.content)
+
+
+class AppdAsyncRestApi:
+    def __init__(
+        self,
+        controller_url: str,
+        client_id: str,
+        client_secret: str,
+        controller_certificate=None,
+        pool_maxsize: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        token_refresh_margin: float = 60,
+        token_cache: AppdTokenCache = None,
+        timeout: float = 60,
+        stats: AppdStats = None,
+        rate_limiter: AppdRateLimiter = None,
+    ):
+        self.controller_url = controller_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.client_token = None
+        self.client_token_expires_at = None
+        self.token_refresh_margin = token_refresh_margin
+        self.token_cache = token_cache
+        self.controller_certificate = controller_certificate
+        self.pool_maxsize = pool_maxsize
+        self.max_retries = max_retries
+        self.backoff_factor = backoff_factor
+        self.timeout = timeout
+        self.stats = stats
+        self.rate_limiter = rate_limiter
+        self.request_count = 0
+        self.session = None
+        self.__token_lock = None
+        self.__limiter_executor = None
+
+    async def __aenter__(self):
+        ssl_context = (
+            ssl.create_default_context(cafile=self.controller_certificate)
+            if self.controller_certificate is not None
+            else None
+        )
+        # like requests, the timeout is for connecting and between two reads
+        timeout = (
+            aiohttp.ClientTimeout(
+                total=None, sock_connect=min(10, self.timeout), sock_read=self.timeout
+            )
+            if self.timeout > 0
+            else aiohttp.ClientTimeout(total=None)
+        )
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.TCPConnector(limit=self.pool_maxsize, ssl=ssl_context),
+            timeout=timeout,
+        )
+        self.__token_lock = asyncio.Lock()
+        if self.rate_limiter is not None:
+            # the limiter blocks while it waits, in own threads so it can't
+            # take those of the default executor, which aiohttp resolves with
+            self.__limiter_executor = ThreadPoolExecutor(max_workers=self.pool_maxsize)
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.session.close()
+        self.session = None
+        if self.__limiter_executor is not None:
+            self.__limiter_executor.shutdown(wait=False)
+            self.__limiter_executor = None
+
+    async def get(self, url, params=None, data=None, json=None, headers=None):
+        return await self.execute("GET", url, params, data, json, headers)
+
+    async def post(self, url, params=None, data=None, json=None, headers=None):
+        return await self.execute("POST", url, params, data, json, headers)
+
+    async def execute(
+        self, method, url, params=None, data=None, json=None, headers=None
+    ):
+        request_url = f"{self.controller_url}{url}"
+        request_headers = {} if headers == None else headers
+        token = await self.get_token()
+        request_headers["Authorization"] = f"Bearer {token}"
+
+        response = await self.__send(
+            method, request_url, params, data, json, request_headers
+        )
+
+        if response.status_code == 401 and "invalid access token" in response.text:
+            logging.info("Retry - Generate new Token")
+            request_headers["Authorization"] = f"Bearer {await self.renew_token(token)}"
+            response = await self.__send(
+                method, request_url, params, data, json, request_headers
+            )
+
+        return response
+
+    async def __send(self, method, url, params, data, json, headers):
+        # shares the limiter of the sync client
+        if self.rate_limiter is None:
+            return await self.__execute_request(
+                method, url, params, data, json, headers
+            )
+
+        started_at = await asyncio.get_running_loop().run_in_executor(
+            self.__limiter_executor, self.rate_limiter.acquire
+        )
+        status_codes = []
+        try:
+            return await self.__execute_request(
+                method, url, params, data, json, headers, status_codes
+            )
+        finally:
+            self.rate_limiter.release(started_at, status_codes)
+
+    async def __execute_request(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        json=None,
+        headers=None,
+        status_codes: list = None,
+    ):
+        self.request_count += 1
+        started = time.perf_counter()
+        result = None
+        try:
+            result = await self.__execute_attempts(
+                method,
+                url,
+                params,
+                data,
+                json,
+                headers,
+                status_codes if status_codes is not None else [],
+            )
+            return result
+        finally:
+            if self.stats is not None:
+                self.stats.record_request(
+                    url,
+                    started,
+                    time.perf_counter() - started,
+                    result.status_code if result is not None else None,
+                    len(result.content) if result is not None else None,
+                )
+
+    async def __execute_attempts(
+        self, method, url, params, data, json, headers, status_codes: list
+    ):
+        # status_codes collects the status of every attempt for the limiter
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with self.session.request(
+                    method, url, params=params, data=data, json=json, headers=headers
+                ) as response:
+                    content = await response.read()
+                    result = AppdAsyncResponse(
+                        response.status, response.headers, content
+                    )
+                    status_codes.append(result.status_code)
+            except (aiohttp.ClientConnectionError, asyncio.TimeoutError) as e:
+                if attempt == self.max_retries:
+                    raise e
+                logging.info(f"Retry - {type(e)} for {url}")
+                await asyncio.sleep(self.__get_backoff_time(attempt))
+                continue
+
+            if result.status_code in RETRY_STATUS_CODES and attempt < self.max_retries:
+                logging.info(f"Retry - Status {result.status_code} for {url}")
+                retry_after = self.__get_retry_after(result)
+                await asyncio.sleep(
+                    retry_after
+                    if retry_after is not None
+                    else self.__get_backoff_time(attempt)
+                )
+                continue
+
+            return result
+
+    def __get_backoff_time(self, attempt: int):
+        # same schedule as urllib3 Retry (no wait before the first retry), full jitter
+        if attempt == 0:
+            return 0
+        return random.uniform(0, self.backoff_factor * (2**attempt))
+
+    def __get_retry_after(self, response: AppdAsyncResponse):
+        if response.status_code not in [413, 429, 503]:
+            return None
+        retry_after = response.headers.get("Retry-After")
+        if retry_after is None:
+            return None
+        if retry_after.strip().isdigit():
+            return int(retry_after)
+        try:
+            retry_at = email.utils.parsedate_to_datetime(retry_after)
+            return max(0, retry_at.timestamp() - time.time())
+        except (TypeError, ValueError):
+            return None
+
+    async def get_token(self):
+        if self.__token_is_fresh():
+            return self.client_token
+
+        async with self.__token_lock:
+            # another task may have refreshed the token while we waited
+            if not self.__token_is_fresh():
+                await self.__refresh_token()
+            return self.client_token
+
+    async def renew_token(self, rejected_token: str):
+        async with self.__token_lock:
+            if self.client_token == rejected_token:
+                await self.__refresh_token(use_cache=False)
+            return self.client_token
+
+    def __token_is_fresh(self):
+        if self.client_token is None:
+            return False
+        if self.client_token_expires_at is None:
+            return True
+        return time.time() < self.client_token_expires_at - self.token_refresh_margin
+
+    async def __refresh_token(self, use_cache: bool = True):
+        if use_cache and self.token_cache is not None:
+            cached = self.token_cache.load(
+                self.controller_url, self.client_id, self.token_refresh_margin
+            )
+            if cached is not None:
+                self.client_token, self.client_token_expires_at = cached
+                return
+
+        self.client_token = await self.get_bearer_token()
+        if self.token_cache is not None:
+            self.token_cache.store(
+                self.controller_url,
+                self.client_id,
+                self.client_token,
+                self.client_token_expires_at,
+            )
+
+    async def get_bearer_token(self):
+        url = f"{self.controller_url}/controller/api/oauth/access_token"
+        headers = {"Content-Type": "application/vnd.appd.cntrl+protobuf;v=1"}
+        data = f"grant_type=client_credentials&client_id={self.client_id}&client_secret={self.client_secret}"
+
+        try:
+            response = await self.__execute_request(
+                "POST", url, data=data, headers=headers
+            )
+            data = response.json()
+            token = data["access_token"]
+            self.client_token_expires_at = (
+                time.time() + data["expires_in"] if "expires_in" in data else None
+            )
+            logging.info(f"Generated Token: {token[:20]}...")
+            return token
+        except Exception as e:
+            logging.error(f"Failed to authenticate: {type(e)}")
+            raise e
+
+
+class AppdAsyncDashboards(AppdDashboardCache):
+    def __init__(self, appd_api: AppdAsyncRestApi, cache: AppdCache = None):
+        self.appd_api: AppdAsyncRestApi = appd_api
+        self.cache: AppdCache = cache
+
+    async def get_dashboards(self):
+        url = f"/controller/restui/dashboards/getAllDashboardsByType/false"
+        try:
+            response = await self.appd_api.get(url)
+            data = response.json()
+            logging.info(f"Number of Dashboards: {len(data)}")
+            return data
+        except Exception as e:
+            logging.error(f"Failed to load dashboards: {type(e)}")
+            raise e
+
+    async def load_dashboard(self, dashboard: dict):
+        details, version = self.get_cached_dashboard(dashboard)
+        if version is not None:
+            updated_details = await self.get_dashboard(dashboard["id"], version)
+            if updated_details is not None:
+                # reused details aren't written again, so their entry ages
+                details = updated_details
+                self.store_cached_dashboard(dashboard, details)
+        return details
+
+    async def get_dashboard(self, id: int, version: int = -1):
+        url = f"/controller/restui/dashboards/dashboardIfUpdated/{id}/{version}"
+        try:
+            response = await self.appd_api.get(url)
+            if response.status_code == 204 or len(response.content) == 0:
+                logging.debug(f"Dashboard [{id}] - Not updated since version {version}")
+                return None
+            data = response.json()
+            return data
+        except Exception as e:
+            logging.error(f"Failed to load dashboard: {type(e)}")
+            raise e
+
+
+class AppdAsyncHealthrules(AppdHealthruleCache):
+    def __init__(self, appd_api: AppdAsyncRestApi, cache: AppdCache = None):
+        self.appd_api: AppdAsyncRestApi = appd_api
+        self.cache: AppdCache = cache
+
+    async def get_healthrules(self, app_id: int):
+        url = f"/controller/alerting/rest/v1/applications/{app_id}/health-rules"
+        try:
+            response = await self.appd_api.get(url)
+            data = response.json()
+            logging.info(f"Number of HealthRules: {len(data)}")
+            return data
+        except Exception as e:
+            logging.error(f"Failed to load HealthRules: {type(e)}")
+            raise e
+
+    async def load_healthrule(self, app_id: int, health_rule_id: int):
+        details = self.get_cached_healthrule(app_id, health_rule_id)
+        if details is None:
+            details = await self.get_healthrule(app_id, health_rule_id)
+            self.store_cached_healthrule(app_id, health_rule_id, details)
+        return details
+
+    async def get_healthrule(self, app_id: int, health_rule_id: int):
+        url = f"/controller/alerting/rest/v1/applications/{app_id}/health-rules/{health_rule_id}"
+        try:
+            response = await self.appd_api.get(url)
+            data = response.json()
+            return data
+        except Exception as e:
+            logging.error(f"Failed to load HealthRule: {type(e)}")
+            raise e
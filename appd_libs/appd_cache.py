@@ -0,0 +1,83 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+
+class AppdCache:
+    def __init__(
+        self,
+        directory: str,
+        controller_url: str,
+        ttl: float = 86400,
+        max_size: int = 512 * 1024 * 1024,
+    ):
+        self.controller_url = controller_url.rstrip("/")
+        self.directory = os.path.join(
+            os.path.expanduser(directory),
+            hashlib.sha256(self.controller_url.encode()).hexdigest()[:16],
+        )
+        self.ttl = ttl
+        self.max_size = max_size
+
+    def get(self, endpoint: str, id):
+        path = self.__path(endpoint, id)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                entry = json.load(file)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logging.warning(f"Invalid cache entry {path}: {type(e)}")
+            return None
+
+        if entry["stored_at"] + self.ttl <= time.time():
+            logging.debug(f"Cache entry {endpoint}:[{id}] expired")
+            return None
+        return entry
+
+    def put(self, endpoint: str, id, data, **metadata):
+        entry = {
+            "controller": self.controller_url,
+            "endpoint": endpoint,
+            "id": id,
+            "stored_at": time.time(),
+            "data": data,
+            **metadata,
+        }
+        path = self.__path(endpoint, id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+                json.dump(entry, file)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write cache entry {path}: {type(e)}")
+
+    def evict(self):
+        try:
+            entries = [entry for entry in os.scandir(self.directory) if entry.is_file()]
+        except FileNotFoundError:
+            return
+
+        now = time.time()
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        size = 0
+        for entry in entries:
+            stat = entry.stat()
+            size += stat.st_size
+            # entries are only written when fetched, so mtime is the fetch time
+            if stat.st_mtime + self.ttl <= now or size > self.max_size:
+                logging.debug(f"Evict cache entry {entry.path}")
+                os.remove(entry.path)
+
+    def clear(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __path(self, endpoint: str, id):
+        key = hashlib.sha256(f"{endpoint}|{id}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{key}.json.gz")
@@ -0,0 +1,96 @@
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+
+def map_ordered(function, items, parallelism: int = 1, on_done=None):
+    results = {}
+    for position, item, result in map_unordered(function, items, parallelism):
+        results[position] = result
+        if on_done is not None:
+            on_done(item, result)
+    return [results[position] for position in range(len(results))]
+
+
+def map_unordered(function, items, parallelism: int = 1):
+    # yields (position, item, result) in the caller's thread as results arrive
+    if parallelism <= 1:
+        for position, item in enumerate(items):
+            yield position, item, function(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        pending = {}
+        try:
+            for position, item in enumerate(items):
+                # never keep more than `parallelism` requests in flight
+                if len(pending) >= parallelism:
+                    yield from _collect(pending)
+                pending[executor.submit(function, item)] = (position, item)
+
+            while len(pending) > 0:
+                yield from _collect(pending)
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
+
+
+def _collect(pending: dict):
+    done, _ = wait(pending, return_when=FIRST_COMPLETED)
+    for future in done:
+        position, item = pending.pop(future)
+        yield position, item, future.result()
+
+
+def map_unordered_by_key(
+    function, queue: deque, key, parallelism: int = 1, parallelism_per_key: int = None
+):
+    # yields (item, result) in the caller's thread as results arrive, items
+    # appended to the queue while iterating are scheduled as well
+    if parallelism_per_key is None or parallelism_per_key > parallelism:
+        parallelism_per_key = parallelism
+
+    if parallelism <= 1:
+        while len(queue) > 0:
+            item = queue.popleft()
+            yield item, function(item)
+        return
+
+    with ThreadPoolExecutor(max_workers=parallelism) as executor:
+        waiting = {}  # key -> deque of items, in order of first appearance
+        running = {}  # key -> number of items in flight
+        pending = {}
+        try:
+            while True:
+                while len(queue) > 0:
+                    item = queue.popleft()
+                    waiting.setdefault(key(item), deque()).append(item)
+
+                # round robin over the keys, so one key can't take all workers
+                for item_key in list(waiting):
+                    if len(pending) >= parallelism:
+                        break
+                    items = waiting[item_key]
+                    while (
+                        len(items) > 0
+                        and running.get(item_key, 0) < parallelism_per_key
+                        and len(pending) < parallelism
+                    ):
+                        item = items.popleft()
+                        pending[executor.submit(function, item)] = item
+                        running[item_key] = running.get(item_key, 0) + 1
+                    if len(items) == 0:
+                        del waiting[item_key]
+
+                if len(pending) == 0:
+                    return
+
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    item = pending.pop(future)
+                    running[key(item)] -= 1
+                    yield item, future.result()
+        except BaseException:
+            for future in pending:
+                future.cancel()
+            raise
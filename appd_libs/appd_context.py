@@ -0,0 +1,244 @@
+import configparser
+import functools
+import os
+
+DEFAULT_CACHE_DIRECTORY = "~/.cache/appd-dependency-check"
+DEFAULT_STORE_DIRECTORY = "~/.local/share/appd-dependency-check"
+
+# [controller] and [applications] belong to the default controller, named
+# controllers use [controller:<name>] and [applications:<name>]
+DEFAULT_CONTROLLER = "default"
+CONTROLLER_SECTIONS = ["controller", "applications"]
+# ids of one controller, which named controllers don't inherit
+INTERNAL_APPLICATION_OPTIONS = [
+    "analytics_application_id",
+    "db_mon_application",
+    "sim_application_id",
+]
+
+
+class AppdContext:
+    # config and clients are built on first use, so `--help` doesn't parse the
+    # config or import requests
+    def __init__(
+        self, config_path: str = "config.ini", controller: str = DEFAULT_CONTROLLER
+    ):
+        self.config_path = config_path
+        self.controller = controller
+        # selected with --controller and --all-controllers
+        self.controller_names = []
+        self.all_controllers = False
+
+    @functools.cached_property
+    def config(self):
+        config = configparser.ConfigParser()
+        config.read(self.config_path)
+
+        # named sections inherit the options they don't set, but the internal
+        # application ids of the default controller
+        for section in config.sections():
+            base, _, name = section.partition(":")
+            if name and base in CONTROLLER_SECTIONS and config.has_section(base):
+                for option, value in config.items(base, raw=True):
+                    if (
+                        not config.has_option(section, option)
+                        and option not in INTERNAL_APPLICATION_OPTIONS
+                    ):
+                        config.set(section, option, value)
+        return config
+
+    def get_section(self, section: str):
+        named_section = f"{section}:{self.controller}"
+        if self.controller != DEFAULT_CONTROLLER and self.config.has_section(
+            named_section
+        ):
+            return named_section
+        return section
+
+    @property
+    def controller_section(self):
+        return self.get_section("controller")
+
+    @property
+    def applications_section(self):
+        return self.get_section("applications")
+
+    def get_controller_names(self):
+        names = (
+            [DEFAULT_CONTROLLER] if self.config.has_option("controller", "url") else []
+        )
+        for section in self.config.sections():
+            base, _, name = section.partition(":")
+            if base == "controller" and name:
+                names.append(name)
+        return names
+
+    def get_controller_context(self, controller: str):
+        context = AppdContext(self.config_path, controller)
+        context.config = self.config
+        return context
+
+    @functools.cached_property
+    def controllers(self):
+        # the contexts a command runs on, with more than one it fans out
+        if self.all_controllers:
+            names = self.get_controller_names()
+        elif len(self.controller_names) > 0:
+            names = list(dict.fromkeys(self.controller_names))
+        else:
+            return [self]
+        return [
+            self if name == self.controller else self.get_controller_context(name)
+            for name in names
+        ]
+
+    @property
+    def controller_url(self):
+        return self.config.get(self.controller_section, "url")
+
+    @functools.cached_property
+    def rest_api_settings(self):
+        from .appd_token_cache import AppdTokenCache
+
+        config = self.config
+        section = self.controller_section
+        return {
+            "controller_url": self.controller_url,
+            "client_id": config.get(section, "client_id"),
+            "client_secret": config.get(section, "client_secret"),
+            "pool_maxsize": config.getint(
+                section,
+                "pool_maxsize",
+                fallback=max(10, self.parallelism),
+            ),
+            "max_retries": config.getint(section, "max_retries", fallback=3),
+            "backoff_factor": config.getfloat(section, "backoff_factor", fallback=0.5),
+            "token_refresh_margin": config.getfloat(
+                section, "token_refresh_margin", fallback=60
+            ),
+            "token_cache": AppdTokenCache(config.get(section, "token_cache"))
+            if config.has_option(section, "token_cache")
+            else None,
+            "timeout": config.getfloat(section, "timeout", fallback=60),
+            "stats": self.stats,
+        }
+
+    @functools.cached_property
+    def stats(self):
+        from .appd_stats import AppdStats
+
+        return AppdStats()
+
+    @property
+    def parallelism(self):
+        return self.config.getint(self.controller_section, "parallelism", fallback=1)
+
+    @functools.cached_property
+    def rest_api(self):
+        from .appd_rest_api import AppdRestApi
+
+        return AppdRestApi(
+            **self.rest_api_settings,
+            pool_connections=self.config.getint(
+                self.controller_section, "pool_connections", fallback=10
+            ),
+            rate_limiter=self.rate_limiter,
+        )
+
+    @functools.cached_property
+    def rate_limiter(self):
+        from .appd_rate_limiter import AppdRateLimiter
+
+        config = self.config
+        section = self.controller_section
+        max_rate = config.getfloat(section, "rate_limit", fallback=0)
+        adaptive = config.getboolean(section, "adaptive_rate_limit", fallback=True)
+        if max_rate <= 0 and not adaptive:
+            return None
+        return AppdRateLimiter(
+            # starts with a request per pooled connection
+            self.rest_api_settings["pool_maxsize"],
+            max_rate=max_rate,
+            min_rate=config.getfloat(section, "min_rate_limit", fallback=1),
+            rate_increase=config.getfloat(section, "rate_limit_increase", fallback=1),
+            latency_tolerance=config.getfloat(section, "latency_tolerance", fallback=2),
+            adaptive=adaptive,
+        )
+
+    @functools.cached_property
+    def internal_application_ids(self):
+        # a named controller without [applications:<name>] has none configured
+        section = (
+            f"applications:{self.controller}"
+            if self.controller != DEFAULT_CONTROLLER
+            else "applications"
+        )
+        return [
+            self.config.getint(section, option, fallback=0)
+            for option in INTERNAL_APPLICATION_OPTIONS
+        ]
+
+    @functools.cached_property
+    def response_cache(self):
+        from .appd_cache import AppdCache
+
+        return AppdCache(
+            self.config.get("cache", "directory", fallback=DEFAULT_CACHE_DIRECTORY),
+            self.controller_url,
+            ttl=self.config.getfloat("cache", "ttl", fallback=86400),
+            max_size=self.config.getint("cache", "max_size_mb", fallback=512)
+            * 1024
+            * 1024,
+        )
+
+    @functools.cached_property
+    def internal_applications_cache(self):
+        # internal applications rarely change, they are cached independent of
+        # cache:enabled
+        from .appd_cache import AppdCache
+
+        ttl = self.config.getfloat(
+            self.applications_section, "cache_ttl", fallback=604800
+        )
+        if ttl <= 0:
+            return None
+        return AppdCache(
+            os.path.join(
+                self.config.get("cache", "directory", fallback=DEFAULT_CACHE_DIRECTORY),
+                "applications",
+            ),
+            self.controller_url,
+            ttl=ttl,
+        )
+
+    @functools.cached_property
+    def healthrule_store(self):
+        from .appd_healthrule_store import AppdHealthruleStore
+
+        return AppdHealthruleStore(
+            self.config.get(
+                "incremental", "directory", fallback=DEFAULT_STORE_DIRECTORY
+            ),
+            self.controller_url,
+            revalidate_after=self.config.getfloat(
+                "incremental", "revalidate_after", fallback=86400
+            ),
+        )
+
+    @functools.cached_property
+    def applications(self):
+        from .appd_applications import AppdApplications
+
+        return AppdApplications(self.rest_api, self.internal_applications_cache)
+
+    @functools.cached_property
+    def dashboards(self):
+        from .appd_dashboards import AppdDashboards
+
+        return AppdDashboards(self.rest_api)
+
+    @functools.cached_property
+    def healthrules(self):
+        from .appd_healthrules import AppdHealthrules
+
+        return AppdHealthrules(self.rest_api)
@@ -0,0 +1,281 @@
+import contextlib
+import functools
+import logging
+import threading
+
+from .appd_dashboard_model import (
+    METRIC_WIDGET_TYPES,
+    AppdDashboard,
+    AppdUsedDashboardsBuilder,
+    AppdWidget,
+    parse_dashboard,
+)
+from .appd_stats import AppdStats
+from .appd_metric_matcher import get_metric_matcher
+
+
+class AppdDashboardIndex:
+    def __init__(self, dashboards: list):
+        self.dashboards = []
+        self.widgets = {}
+        # widget references are (dashboard position, widget position) tuples
+        self.__metric_widgets = {}  # logical metric name -> app id -> refs
+        self.__metric_widgets_by_app = {}  # app id -> refs
+        self.__analytics_widgets = {}  # adql query -> refs
+        self.__health_widgets = {}  # app id -> refs
+        self.__event_widgets = {}  # app id -> refs
+        self.__matching = {}
+
+        for dashboard in dashboards:
+            self.add_dashboard(dashboard)
+
+    def add_dashboard(self, dashboard: AppdDashboard):
+        position = len(self.dashboards)
+        self.dashboards.append((dashboard.id, dashboard.name))
+        for widget_position, widget in enumerate(dashboard.widgets):
+            self.__add_widget((position, widget_position), widget)
+
+        # new names have to be matched again
+        self.__matching = {}
+
+    def __add_widget(self, ref: tuple, widget: AppdWidget):
+        self.widgets[ref] = (widget.id, widget.title)
+        if widget.type in METRIC_WIDGET_TYPES:
+            for app_id, name in widget.metrics:
+                self.__metric_widgets.setdefault(name, {}).setdefault(
+                    app_id, set()
+                ).add(ref)
+                self.__metric_widgets_by_app.setdefault(app_id, set()).add(ref)
+
+        elif widget.type == "ANALYTICS":
+            for adql_query in widget.adql_queries:
+                self.__analytics_widgets.setdefault(adql_query, set()).add(ref)
+
+        elif widget.type == "HEALTH_LIST":
+            for app_id in widget.application_ids:
+                self.__health_widgets.setdefault(app_id, set()).add(ref)
+
+        elif widget.type == "LIST":
+            for app_id in widget.application_ids:
+                self.__event_widgets.setdefault(app_id, set()).add(ref)
+
+    def get_dashboards_used_by_app_and_metric(
+        self,
+        app_id: int = None,
+        metrics: list = None,
+        metric_match: str = None,
+    ):
+        matched_widgets = {}
+
+        if metrics is not None and len(metrics) > 0:
+            matching_names, matching_queries = self.__get_matching(
+                metrics, metric_match
+            )
+            for metric in metrics:
+                refs = set()
+                for name in matching_names.get(metric, []):
+                    if app_id is None:
+                        for app_refs in self.__metric_widgets[name].values():
+                            refs |= app_refs
+                    else:
+                        refs |= self.__metric_widgets[name].get(app_id, set())
+                for adql_query in matching_queries.get(metric, []):
+                    refs |= self.__analytics_widgets[adql_query]
+
+                for ref in refs:
+                    matched_widgets.setdefault(ref, []).append(metric)
+
+        elif app_id is None:
+            for ref in set().union(*self.__metric_widgets_by_app.values()):
+                matched_widgets[ref] = []
+
+        else:
+            for ref in (
+                self.__metric_widgets_by_app.get(app_id, set())
+                | self.__health_widgets.get(app_id, set())
+                | self.__event_widgets.get(app_id, set())
+            ):
+                matched_widgets[ref] = []
+
+        return self.__get_used_dashboards(matched_widgets)
+
+    def __get_matching(self, metrics: list, metric_match: str):
+        # every distinct name and query is tested once against all metrics
+        key = (tuple(metrics), metric_match)
+        if key not in self.__matching:
+            matcher = get_metric_matcher(metrics, metric_match)
+            matching_names = {}
+            for name in self.__metric_widgets:
+                for metric in matcher.get_matching_metrics(name):
+                    matching_names.setdefault(metric, []).append(name)
+            matching_queries = {}
+            for adql_query in self.__analytics_widgets:
+                for metric in matcher.get_matching_metrics(adql_query):
+                    matching_queries.setdefault(metric, []).append(adql_query)
+            self.__matching[key] = matching_names, matching_queries
+        return self.__matching[key]
+
+    def __get_used_dashboards(self, matched_widgets: dict):
+        used_dashboards = AppdUsedDashboardsBuilder()
+        for ref in sorted(matched_widgets):
+            dashboard_id, dashboard_name = self.dashboards[ref[0]]
+            widget_id, widget_title = self.widgets[ref]
+            used_dashboards.add(dashboard_id, dashboard_name, widget_id, widget_title)
+            for metric in matched_widgets[ref]:
+                used_dashboards.add(
+                    dashboard_id, dashboard_name, widget_id, widget_title, metric
+                )
+        return used_dashboards.get_used_dashboards()
+
+
+class AppdDashboardUsageCollector:
+    def __init__(
+        self,
+        app_ids: list,
+        metrics: list,
+        metric_match: str,
+        workers: int = 1,
+        process_threshold: int = 2000,
+        stats: AppdStats = None,
+    ):
+        # use [None] as app_ids to search all applications for the metrics
+        self.app_ids = app_ids
+        self.metrics = metrics
+        self.metric_match = metric_match
+        self.workers = workers
+        self.process_threshold = process_threshold
+        self.stats = stats
+        self.__used_dashboards = {app_id: [] for app_id in app_ids}
+        # dashboards are indexed as they arrive and the index is queried once
+        # per application when all of them are there
+        self.__index = AppdDashboardIndex([])
+        self.__positions = {}  # dashboard id -> position
+        self.__pending = []  # (position, parsed dashboard), matched with workers
+
+    def add_dashboard(self, position: int, dashboard: dict):
+        # only the compact parsed form is kept, the dashboard itself can be dropped
+        try:
+            with self.__phase("parse"):
+                parsed_dashboard = parse_dashboard(dashboard)
+        except Exception:
+            logging.error(f"Dashboard [{position + 1}] - Failed to index dashboard")
+            return
+
+        if self.workers > 1:
+            self.__pending.append((position, parsed_dashboard))
+        else:
+            with self.__phase("match"):
+                self.__index_dashboard(position, parsed_dashboard)
+
+    def finish(self):
+        # matches the indexed dashboards and those buffered for the workers
+        if len(self.__pending) == 0 and len(self.__positions) == 0:
+            return
+        with self.__phase("match"):
+            if len(self.__pending) > 0:
+                self.__match_pending()
+            if len(self.__positions) > 0:
+                self.__add_used_dashboards(
+                    get_used_dashboards(
+                        self.__index,
+                        self.__positions,
+                        self.app_ids,
+                        self.metrics,
+                        self.metric_match,
+                    )
+                )
+                self.__index = AppdDashboardIndex([])
+                self.__positions = {}
+
+    def __index_dashboard(self, position: int, dashboard: AppdDashboard):
+        self.__index.add_dashboard(dashboard)
+        self.__positions[dashboard.id] = position
+
+    def __phase(self, name: str):
+        if self.stats is None:
+            return contextlib.nullcontext()
+        return self.stats.phase(name)
+
+    def get_dashboards_used_by_app(self, app_id: int = None):
+        self.finish()
+        return [
+            used_dashboard
+            for _, used_dashboard in sorted(
+                self.__used_dashboards[app_id], key=lambda used: used[0]
+            )
+        ]
+
+    def __match_pending(self):
+        pending = sorted(self.__pending, key=lambda dashboard: dashboard[0])
+        self.__pending = []
+
+        if len(pending) < self.process_threshold:
+            for position, dashboard in pending:
+                self.__index_dashboard(position, dashboard)
+            return
+
+        # a few chunks per worker, so a slow chunk doesn't hold up the others
+        chunk_size = -(-len(pending) // (self.workers * 4))
+        chunks = [
+            pending[start : start + chunk_size]
+            for start in range(0, len(pending), chunk_size)
+        ]
+        logging.info(
+            f"Match {len(pending)} Dashboards in {len(chunks)} chunks with {self.workers} workers"
+        )
+        # only imported for large dashboard sets, it slows down the startup
+        import multiprocessing
+        from concurrent.futures import ProcessPoolExecutor
+
+        # other threads, like the controllers of a fan-out, may hold locks
+        # while a fork copies them into the workers
+        mp_context = (
+            None
+            if threading.current_thread() is threading.main_thread()
+            else multiprocessing.get_context("forkserver")
+        )
+        with ProcessPoolExecutor(
+            max_workers=self.workers, mp_context=mp_context
+        ) as executor:
+            for used_dashboards in executor.map(
+                functools.partial(
+                    match_dashboards,
+                    app_ids=self.app_ids,
+                    metrics=self.metrics,
+                    metric_match=self.metric_match,
+                ),
+                chunks,
+            ):
+                self.__add_used_dashboards(used_dashboards)
+
+    def __add_used_dashboards(self, used_dashboards: dict):
+        for app_id, used in used_dashboards.items():
+            self.__used_dashboards[app_id] += used
+
+
+def match_dashboards(dashboards: list, app_ids: list, metrics: list, metric_match: str):
+    # runs in worker processes as well, dashboards are (position, AppdDashboard)
+    dashboard_index = AppdDashboardIndex([dashboard for _, dashboard in dashboards])
+    positions = {dashboard.id: position for position, dashboard in dashboards}
+    return get_used_dashboards(
+        dashboard_index, positions, app_ids, metrics, metric_match
+    )
+
+
+def get_used_dashboards(
+    dashboard_index: AppdDashboardIndex,
+    positions: dict,
+    app_ids: list,
+    metrics: list,
+    metric_match: str,
+):
+    # returns app id -> [(position, used dashboard), ...]
+    return {
+        app_id: [
+            (positions[used_dashboard["id"]], used_dashboard)
+            for used_dashboard in dashboard_index.get_dashboards_used_by_app_and_metric(
+                app_id, metrics, metric_match
+            )
+        ]
+        for app_id in app_ids
+    }
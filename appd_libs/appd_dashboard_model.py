@@ -0,0 +1,175 @@
+import logging
+import sys
+
+import click
+
+METRIC_WIDGET_TYPES = ["TIMESERIES_GRAPH", "PIE", "GAUGE", "METRIC_LABEL"]
+
+
+class AppdWidget:
+    __slots__ = ("id", "title", "type", "application_ids", "metrics", "adql_queries")
+
+    def __init__(
+        self,
+        id: int,
+        title: str,
+        type: str,
+        application_ids: tuple = (),
+        metrics: tuple = (),
+        adql_queries: tuple = (),
+    ):
+        self.id = id
+        self.title = title
+        self.type = type
+        self.application_ids = application_ids
+        # (application id, logical metric name) of metric widgets
+        self.metrics = metrics
+        self.adql_queries = adql_queries
+
+
+class AppdDashboard:
+    __slots__ = ("id", "name", "widgets")
+
+    def __init__(self, id: int, name: str, widgets: tuple = ()):
+        self.id = id
+        self.name = name
+        self.widgets = widgets
+
+
+def parse_dashboard(dashboard: dict):
+    # keeps only what the checks need, the controller JSON can be dropped
+    # afterwards
+    widgets = []
+    for position, widget in enumerate(dashboard["widgets"]):
+        try:
+            parsed_widget = parse_widget(widget)
+        except Exception:
+            logging.error(
+                f"Dashboard [{dashboard['name']}] - Failed to parse widget {position}"
+            )
+            continue
+        if parsed_widget is not None:
+            widgets.append(parsed_widget)
+    return AppdDashboard(dashboard["id"], dashboard["name"], tuple(widgets))
+
+
+def parse_widget(widget: dict):
+    # returns None for widgets, which can't reference an application or metric
+    if widget["type"] in METRIC_WIDGET_TYPES:
+        if widget["widgetsMetricMatchCriterias"] is None:
+            return None
+        metrics = []
+        for criteria in widget["widgetsMetricMatchCriterias"]:
+            app_id = criteria["metricMatchCriteria"]["applicationId"]
+            for name in get_logical_metric_names(
+                criteria["metricMatchCriteria"]["metricExpression"]
+            ):
+                # names repeat across widgets, one copy is enough
+                metrics.append((app_id, sys.intern(name) if name is not None else None))
+        return AppdWidget(
+            widget["id"],
+            widget["title"],
+            widget["type"],
+            application_ids=tuple(dict.fromkeys(app_id for app_id, _ in metrics)),
+            metrics=tuple(dict.fromkeys(metrics)),
+        )
+
+    elif widget["type"] == "ANALYTICS":
+        return AppdWidget(
+            widget["id"],
+            widget["title"],
+            widget["type"],
+            adql_queries=tuple(
+                adql_query
+                for adql_query in widget["adqlQueries"]
+                if adql_query is not None
+            ),
+        )
+
+    elif widget["type"] == "HEALTH_LIST":
+        if widget["applicationId"] != 0:
+            app_ids = [widget["applicationId"]]
+        elif widget["entityType"] == "APPLICATION":
+            app_ids = widget["entityIds"]
+        else:
+            app_ids = []
+        return AppdWidget(
+            widget["id"],
+            widget["title"],
+            widget["type"],
+            application_ids=tuple(app_ids),
+        )
+
+    elif widget["type"] == "LIST":
+        if (
+            widget["eventFilter"] is not None
+            and widget["eventFilter"]["applicationIds"] is not None
+        ):
+            app_ids = widget["eventFilter"]["applicationIds"]
+        else:
+            app_ids = []
+        return AppdWidget(
+            widget["id"],
+            widget["title"],
+            widget["type"],
+            application_ids=tuple(app_ids),
+        )
+
+    return None
+
+
+def get_logical_metric_names(expression: dict):
+    if expression["type"] == "BOOLEAN_METRIC_EXPRESSION":
+        return get_logical_metric_names(
+            expression["expression1"]
+        ) + get_logical_metric_names(expression["expression2"])
+    elif expression["type"] == "LEAF_METRIC_EXPRESSION":
+        if expression["metricDefinition"] is None:
+            return []
+        return [expression["metricDefinition"]["logicalMetricName"]]
+    else:
+        click.echo(f'Unknown expression type: {expression["type"]}')
+        return []
+
+
+class AppdUsedDashboardsBuilder:
+    # collects matched widgets in first seen order, keyed by dashboard and
+    # widget id, so every match is added in constant time
+    def __init__(self):
+        self.__dashboards = {}  # dashboard id -> used dashboard
+        self.__widgets = {}  # (dashboard id, widget id) -> used widget
+        self.__metrics = {}  # (dashboard id, widget id) -> set of metrics
+
+    def add(
+        self,
+        dashboard_id: int,
+        dashboard_name: str,
+        widget_id: int,
+        widget_title: str,
+        metric: str = None,
+    ):
+        used_dashboard = self.__dashboards.get(dashboard_id)
+        if used_dashboard is None:
+            used_dashboard = self.__dashboards[dashboard_id] = {
+                "id": dashboard_id,
+                "name": dashboard_name,
+                "widgets": [],
+            }
+
+        key = (dashboard_id, widget_id)
+        used_widget = self.__widgets.get(key)
+        if used_widget is None:
+            used_widget = self.__widgets[key] = {
+                "id": widget_id,
+                "title": widget_title,
+                "metrics": [],
+            }
+            self.__metrics[key] = set()
+            used_dashboard["widgets"].append(used_widget)
+
+        if metric is not None and metric not in self.__metrics[key]:
+            self.__metrics[key].add(metric)
+            used_widget["metrics"].append(metric)
+
+    def get_used_dashboards(self):
+        return list(self.__dashboards.values())
@@ -1,260 +1,102 @@
-import re
-from xmlrpc.client import boolean, boolean
-
-import click
+from .appd_cache import AppdCache
+from .appd_concurrency import map_ordered, map_unordered
+from .appd_json_stream import iter_json_response
 from .appd_rest_api import AppdRestApi
 import logging
 
 
-class AppdDashboards:
-    def __init__(self, appd_api: AppdRestApi):
+class AppdDashboardCache:
+    # cached dashboard details, shared with the async client, needs self.cache
+    def get_cached_dashboard(self, dashboard: dict):
+        # returns the cached details and the version to revalidate them with,
+        # or no version if the dashboard list shows that they are still current
+        if self.cache is None:
+            return None, -1
+
+        cached = self.cache.get("dashboard", dashboard["id"])
+        if cached is None:
+            return None, -1
+        if (
+            dashboard.get("modifiedOn") is not None
+            and cached.get("modified_on") == dashboard["modifiedOn"]
+        ):
+            logging.debug(f"Dashboard [{dashboard['name']}] - Unchanged in cache")
+            return cached["data"], None
+        return cached["data"], cached["data"].get("version", -1)
+
+    def store_cached_dashboard(self, dashboard: dict, details: dict):
+        if self.cache is not None and "id" in details:
+            self.cache.put(
+                "dashboard",
+                dashboard["id"],
+                details,
+                modified_on=dashboard.get("modifiedOn"),
+            )
+
+
+class AppdDashboards(AppdDashboardCache):
+    def __init__(self, appd_api: AppdRestApi, cache: AppdCache = None):
         self.appd_api: AppdRestApi = appd_api
+        self.cache: AppdCache = cache
 
-    def get_dashboards(self):
+    def get_dashboards(self, stream: bool = False):
         url = f"/controller/restui/dashboards/getAllDashboardsByType/false"
         try:
-            response = self.appd_api.get(url)
+            response = self.appd_api.get(url, stream=stream)
+            if stream:
+                return self.__stream_dashboards(response)
             data = response.json()
             logging.info(f"Number of Dashboards: {len(data)}")
+            return data
+        except Exception as e:
+            logging.error(f"Failed to load dashboards: {type(e)}")
+            raise e
 
-            dashboards = []
-            for i, dashboard in enumerate(data, start=1):
-                logging.debug(
-                    f"Dashboard [{i}/{len(data)}][{dashboard['name']}] - Load Dashboard details"
-                )
-                dashboards.append(self.get_dashboard(dashboard["id"]))
-                logging.debug(
-                    f"Dashboard [{i}/{len(data)}][{dashboard['name']}] - Loaded Dashboard details"
-                )
-
-            return dashboards
+    def __stream_dashboards(self, response):
+        count = 0
+        try:
+            for dashboard in iter_json_response(response):
+                count += 1
+                yield dashboard
         except Exception as e:
             logging.error(f"Failed to load dashboards: {type(e)}")
             raise e
+        logging.info(f"Number of Dashboards: {count}")
 
-    def get_dashboard(self, id: int):
-        url = f"/controller/restui/dashboards/dashboardIfUpdated/{id}/-1"
+    def get_dashboards_details(
+        self, dashboards: list, parallelism: int = 1, on_loaded=None
+    ):
+        return map_ordered(self.__load_dashboard, dashboards, parallelism, on_loaded)
+
+    def iter_dashboards_details(self, dashboards, parallelism: int = 1):
+        # yields (position, dashboard, details) as soon as the details arrive
+        return map_unordered(self.__load_dashboard, dashboards, parallelism)
+
+    def __load_dashboard(self, dashboard: dict):
+        logging.debug(f"Dashboard [{dashboard['name']}] - Load Dashboard details")
+        details = self.load_dashboard(dashboard)
+        logging.debug(f"Dashboard [{dashboard['name']}] - Loaded Dashboard details")
+        return details
+
+    def load_dashboard(self, dashboard: dict):
+        details, version = self.get_cached_dashboard(dashboard)
+        if version is not None:
+            updated_details = self.get_dashboard(dashboard["id"], version)
+            if updated_details is not None:
+                # reused details aren't written again, so their entry ages
+                details = updated_details
+                self.store_cached_dashboard(dashboard, details)
+        return details
+
+    def get_dashboard(self, id: int, version: int = -1):
+        url = f"/controller/restui/dashboards/dashboardIfUpdated/{id}/{version}"
         try:
             response = self.appd_api.get(url)
+            if response.status_code == 204 or len(response.content) == 0:
+                logging.debug(f"Dashboard [{id}] - Not updated since version {version}")
+                return None
             data = response.json()
             return data
         except Exception as e:
             logging.error(f"Failed to load dashboard: {type(e)}")
             raise e
-
-    def get_dashboards_used_by_app_and_metric(
-        self,
-        dashboards: list,
-        app_id: int = None,
-        metrics: str = None,
-        metric_match: str = None,
-    ):
-        used_dashboards = []
-        for i, dashboard in enumerate(dashboards, start=1):
-            logging.debug(
-                f"Dashboard [{i}/{len(dashboards)}][{dashboard['name']}] - Check Dashboard"
-            )
-
-            try:
-                for widget in dashboard["widgets"]:
-                    if len(metrics) > 0:
-                        self.__check_widget_by_app_and_metrics(
-                            used_dashboards,
-                            dashboard,
-                            widget,
-                            app_id,
-                            metrics,
-                            metric_match,
-                        )
-                    else:
-                        self.__check_widget_by_app(
-                            used_dashboards, dashboard, widget, app_id
-                        )
-                logging.debug(
-                    f"Dashboard [{i}/{len(dashboards)}][{dashboard['name']}] - Dashboard checked"
-                )
-            except Exception as e:
-                logging.error(
-                    f"Dashboard [{i}/{len(dashboards)}][{dashboard['name']}] - Failed to load dashboard"
-                )
-
-        return used_dashboards
-
-    def __check_widget_by_app_and_metrics(
-        self,
-        used_dashboards: list,
-        dashboard: dict,
-        widget: dict,
-        app_id: int,
-        metrics: list,
-        metric_match: str = None,
-    ):
-        for metric in metrics:
-            if self.__check_if_widget_is_used(widget, app_id, metric, metric_match):
-                self.__append_dashboard_and_widget(
-                    used_dashboards, dashboard, widget, metric
-                )
-
-    def __check_widget_by_app(
-        self, used_dashboards: list, dashboard: dict, widget: dict, app_id: int
-    ):
-        if self.__check_if_widget_is_used(widget, app_id):
-            self.__append_dashboard_and_widget(used_dashboards, dashboard, widget)
-
-    def __check_if_widget_is_used(
-        self,
-        widget: dict,
-        app_id: int = None,
-        metric: str = None,
-        metric_match: str = None,
-    ) -> boolean:
-        if metric is not None:
-            if widget["type"] in [
-                "TIMESERIES_GRAPH",
-                "PIE",
-                "GAUGE",
-                "METRIC_LABEL"]:
-                return self.__check_metrics_widget_used_by_app(
-                    widget, app_id, metric, metric_match
-                )
-            elif widget["type"] == "ANALYTICS":
-                return self.__check_analytics_widget(widget, metric, metric_match)
-            return False
-        else:
-            if widget["type"] in [
-                "TIMESERIES_GRAPH",
-                "PIE",
-                "GAUGE",
-                "METRIC_LABEL"
-            ]:
-                return self.__check_metrics_widget_used_by_app(
-                    widget, app_id, metric, metric_match
-                )
-            elif widget["type"] == "HEALTH_LIST":
-                if app_id is None:
-                    return False
-                return self.__check_health_widget_used_by_app(widget, app_id)
-            elif widget["type"] == "LIST":
-                if app_id is None:
-                    return False
-                return self.__check_event_widget_used_by_app(widget, app_id)
-            return False
-
-    def __check_analytics_widget(self, widget:dict, metric: str, metric_match: str):
-        for adql_query in widget["adqlQueries"]:
-            if self.__check_match(adql_query, metric, metric_match):
-                return True
-        return False
-
-    def __check_event_widget_used_by_app(self, widget: dict, app_id: int):
-        if (
-            widget["eventFilter"] is not None
-            and widget["eventFilter"]["applicationIds"] is not None
-        ):
-            for entity_id in widget["eventFilter"]["applicationIds"]:
-                if entity_id == app_id:
-                    return True
-        return False
-
-    def __check_health_widget_used_by_app(self, widget: dict, app_id: int) -> boolean:
-        if widget["applicationId"] != 0:
-            return widget["applicationId"] == app_id
-        elif widget["entityType"] == "APPLICATION":
-            for entity_id in widget["entityIds"]:
-                if entity_id == app_id:
-                    return True
-        return False
-
-    def __check_metrics_widget_used_by_app(
-        self,
-        widget: dict,
-        app_id: int = None,
-        metric: str = None,
-        metric_match: str = None,
-    ) -> boolean:
-        if widget["widgetsMetricMatchCriterias"] is not None:
-            if app_id is not None:
-                app_ids = [
-                    i["metricMatchCriteria"]["applicationId"]
-                    for i in widget["widgetsMetricMatchCriterias"]
-                    if self.__check_match_expression(
-                        i["metricMatchCriteria"]["metricExpression"],
-                        metric,
-                        metric_match,
-                    )
-                ]
-
-                return app_id in app_ids
-            else:
-                matching_criterias = [
-                    i
-                    for i in widget["widgetsMetricMatchCriterias"]
-                    if self.__check_match_expression(
-                        i["metricMatchCriteria"]["metricExpression"],
-                        metric,
-                        metric_match,
-                    )
-                ]
-                return len(matching_criterias) > 0
-
-        else:
-            return False
-
-    def __append_dashboard_and_widget(
-        self, used_dashboards: list, dashboard: dict, widget: dict, metric: str = None
-    ):
-        used_dashboard = next(
-            (i for i in used_dashboards if i["id"] == dashboard["id"]),
-            None,
-        )
-
-        widget_dict = {"id": widget["id"], "title": widget["title"], "metrics": []}
-        if metric is not None:
-            widget_dict["metrics"].append(metric)
-
-        if used_dashboard is None:
-            used_dashboards.append(
-                {
-                    "id": dashboard["id"],
-                    "name": dashboard["name"],
-                    "widgets": [widget_dict],
-                }
-            )
-        else:
-            used_widget = next(
-                (i for i in used_dashboard["widgets"] if i["id"] == widget["id"]),
-                None,
-            )
-            if used_widget is None:
-                used_dashboard["widgets"].append(widget_dict)
-            elif metric is not None:
-                used_widget["metrics"].append(metric)
-
-
-    def __check_match_expression(self, expression: dict, metric: str, metric_match: str):
-        if expression["type"] == "BOOLEAN_METRIC_EXPRESSION":
-            return self.__check_match_expression(expression["expression1"], metric, metric_match) or self.__check_match_expression(expression["expression2"], metric, metric_match)
-        elif expression["type"] == "LEAF_METRIC_EXPRESSION":
-            if expression["metricDefinition"] is None:
-                return False
-            return self.__check_match(expression["metricDefinition"]["logicalMetricName"], metric, metric_match)
-        else:
-            click.echo(f'Unknown expression type: {expression["type"]}')
-
-    def __check_match(self, input: str, metric: str, metric_match: str):
-        if metric is None:
-            return True
-        if input is None:
-            return False
-
-        if metric_match == "exact":
-            return input == metric
-        elif metric_match == "contains":
-            return re.search(metric, input, re.IGNORECASE)
-        elif metric_match == "contains_case_sensitive":
-            return re.search(metric, input)
-        elif metric_match == "regex":
-            metric_regex = re.compile(metric)
-            return metric_regex.match(input)
-        else:
-            return False
@@ -0,0 +1,59 @@
+import contextlib
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+class AppdTaggedStream:
+    # complete lines are written to the target, prefixed with the tag of the
+    # writing thread, so the output of parallel controllers stays readable
+    def __init__(self, target):
+        self.target = target
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+
+    def set_tag(self, tag: str):
+        self.__local.tag = tag
+
+    def write(self, text: str):
+        buffer = getattr(self.__local, "buffer", "") + text
+        lines = buffer.split("\n")
+        self.__local.buffer = lines.pop()
+        if len(lines) > 0:
+            tag = getattr(self.__local, "tag", "")
+            with self.__lock:
+                self.target.write("".join(f"{tag}{line}\n" for line in lines))
+        return len(text)
+
+    def end_line(self):
+        if getattr(self.__local, "buffer", ""):
+            self.write("\n")
+
+    def flush(self):
+        with self.__lock:
+            self.target.flush()
+
+    def isatty(self):
+        # progress bars only print their label instead of redrawing
+        return False
+
+
+def fan_out(function, contexts: list):
+    # runs function for every controller context at the same time and returns
+    # (result, error) in the order of the contexts
+    stream = AppdTaggedStream(sys.stderr)
+
+    def run(context):
+        stream.set_tag(f"[{context.controller}] ")
+        try:
+            return function(context), None
+        except SystemExit as e:
+            return None, f"exited with {e.code}"
+        except Exception as e:
+            return None, str(e) or str(type(e))
+        finally:
+            stream.end_line()
+
+    with contextlib.redirect_stdout(stream), contextlib.redirect_stderr(stream):
+        with ThreadPoolExecutor(max_workers=len(contexts)) as executor:
+            return list(executor.map(run, contexts))
@@ -0,0 +1,132 @@
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import time
+
+# keys added to the healthrule list entries while checking them
+LOCAL_FIELDS = ["details", "json_valid", "match"]
+
+
+def get_content_hash(data):
+    content = json.dumps(data, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def get_list_hash(healthrule: dict):
+    return get_content_hash(
+        {key: value for key, value in healthrule.items() if key not in LOCAL_FIELDS}
+    )
+
+
+class AppdHealthruleStore:
+    def __init__(
+        self,
+        directory: str,
+        controller_url: str,
+        revalidate_after: float = 86400,
+    ):
+        self.controller_url = controller_url.rstrip("/")
+        self.directory = os.path.join(
+            os.path.expanduser(directory),
+            hashlib.sha256(self.controller_url.encode()).hexdigest()[:16],
+        )
+        # the list payload doesn't show changed criteria, so unchanged list
+        # entries are still fetched again after this many seconds
+        self.revalidate_after = revalidate_after
+        self.__applications = {}
+
+    def get_details(self, app_id: int, healthrule: dict):
+        record = self.__get_record(app_id, healthrule["id"])
+        if record is None:
+            return None
+        if record["list_hash"] != get_list_hash(healthrule):
+            logging.debug(f"HealthRule [{healthrule['id']}] - Changed in list")
+            return None
+        if record["fetched_at"] + self.revalidate_after <= time.time():
+            logging.debug(f"HealthRule [{healthrule['id']}] - Revalidate details")
+            return None
+        return record["details"]
+
+    def put_details(self, app_id: int, healthrule: dict, details: dict):
+        details_hash = get_content_hash(details)
+        record = self.__get_record(app_id, healthrule["id"])
+        if record is None or record["details_hash"] != details_hash:
+            matches = {}
+        else:
+            matches = record["matches"]
+
+        self.__get_application(app_id)[str(healthrule["id"])] = {
+            "list_hash": get_list_hash(healthrule),
+            "fetched_at": time.time(),
+            "details": details,
+            "details_hash": details_hash,
+            "matches": matches,
+        }
+
+    def get_match(self, app_id: int, healthrule_id: int, metrics, metric_match: str):
+        record = self.__get_record(app_id, healthrule_id)
+        if record is None:
+            return None
+        return record["matches"].get(self.__match_key(metrics, metric_match))
+
+    def put_match(
+        self, app_id: int, healthrule_id: int, metrics, metric_match: str, match
+    ):
+        record = self.__get_record(app_id, healthrule_id)
+        if record is not None:
+            record["matches"][self.__match_key(metrics, metric_match)] = match
+
+    def save_application(self, app_id: int, healthrules: list):
+        # rules missing in the current list were deleted on the controller
+        stored = self.__get_application(app_id)
+        ids = {str(healthrule["id"]) for healthrule in healthrules}
+        for deleted_id in [id for id in stored if id not in ids]:
+            logging.debug(f"HealthRule [{deleted_id}] - Deleted")
+            del stored[deleted_id]
+
+        path = self.__path(app_id)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with gzip.open(tmp_path, "wt", encoding="utf-8") as file:
+                json.dump(
+                    {"controller": self.controller_url, "healthrules": stored},
+                    file,
+                    separators=(",", ":"),
+                )
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"Failed to write healthrule store {path}: {type(e)}")
+
+    def clear(self):
+        self.__applications = {}
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def __get_record(self, app_id: int, healthrule_id: int):
+        return self.__get_application(app_id).get(str(healthrule_id))
+
+    def __get_application(self, app_id: int):
+        if app_id not in self.__applications:
+            self.__applications[app_id] = self.__load(app_id)
+        return self.__applications[app_id]
+
+    def __load(self, app_id: int):
+        path = self.__path(app_id)
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                return json.load(file)["healthrules"]
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, KeyError) as e:
+            logging.warning(f"Invalid healthrule store {path}: {type(e)}")
+            return {}
+
+    def __match_key(self, metrics, metric_match: str):
+        # the result of a check doesn't depend on the order of the metrics
+        return json.dumps([metric_match, sorted(set(metrics))])
+
+    def __path(self, app_id: int):
+        return os.path.join(self.directory, f"healthrules-{app_id}.json.gz")
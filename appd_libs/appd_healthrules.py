@@ -1,18 +1,44 @@
-import re
-
 import click
+from collections import deque
+from .appd_cache import AppdCache
+from .appd_concurrency import map_unordered_by_key
+from .appd_healthrule_store import AppdHealthruleStore
+from .appd_json_stream import iter_json_response
+from .appd_metric_matcher import get_metric_matcher
 from .appd_rest_api import AppdRestApi
 import logging
 
 
-class AppdHealthrules:
-    def __init__(self, appd_api: AppdRestApi):
+class AppdHealthruleCache:
+    # cached healthrule details, shared with the async client, needs self.cache
+    def get_cached_healthrule(self, app_id: int, health_rule_id: int):
+        if self.cache is None:
+            return None
+        cached = self.cache.get("healthrule", f"{app_id}/{health_rule_id}")
+        return cached["data"] if cached is not None else None
+
+    def store_cached_healthrule(self, app_id: int, health_rule_id: int, details):
+        if self.cache is not None and "id" in details:
+            self.cache.put("healthrule", f"{app_id}/{health_rule_id}", details)
+
+
+class AppdHealthrules(AppdHealthruleCache):
+    def __init__(
+        self,
+        appd_api: AppdRestApi,
+        cache: AppdCache = None,
+        store: AppdHealthruleStore = None,
+    ):
         self.appd_api: AppdRestApi = appd_api
+        self.cache: AppdCache = cache
+        self.store: AppdHealthruleStore = store
 
-    def get_healthrules(self, app_id: int):
+    def get_healthrules(self, app_id: int, stream: bool = False):
         url = f"/controller/alerting/rest/v1/applications/{app_id}/health-rules"
         try:
-            response = self.appd_api.get(url)
+            response = self.appd_api.get(url, stream=stream)
+            if stream:
+                return self.__stream_healthrules(response)
             data = response.json()
             logging.info(f"Number of HealthRules: {len(data)}")
             return data
@@ -20,6 +46,86 @@ class AppdHealthrules:
             logging.error(f"Failed to load HealthRules: {type(e)}")
             raise e
 
+    def __stream_healthrules(self, response):
+        count = 0
+        try:
+            for healthrule in iter_json_response(response):
+                count += 1
+                yield healthrule
+        except Exception as e:
+            logging.error(f"Failed to load HealthRules: {type(e)}")
+            raise e
+        logging.info(f"Number of HealthRules: {count}")
+
+    def iter_healthrules_details(
+        self,
+        applications: list,
+        parallelism: int = 1,
+        parallelism_per_application: int = None,
+        stream: bool = False,
+    ):
+        # healthrule lists and details of all applications share one pool, an
+        # application is yielded as soon as all of its healthrules are loaded.
+        # With stream, the lists are parsed while they download.
+        tasks = deque((app, None) for app in applications)
+        remaining = {}
+        for (app, healthrule), result in map_unordered_by_key(
+            lambda task: self.__load_task(task, stream),
+            tasks,
+            key=lambda task: task[0]["id"],
+            parallelism=parallelism,
+            parallelism_per_key=parallelism_per_application,
+        ):
+            if healthrule is None:
+                app["healthrules"] = result
+                changed_healthrules = self.__get_changed_healthrules(app, result)
+                remaining[app["id"]] = len(changed_healthrules)
+                tasks.extend((app, healthrule) for healthrule in changed_healthrules)
+            else:
+                if self.store is not None and "id" in result:
+                    self.store.put_details(app["id"], healthrule, result)
+                healthrule["details"] = result
+                remaining[app["id"]] -= 1
+
+            if remaining[app["id"]] == 0:
+                del remaining[app["id"]]
+                yield app
+
+    def __get_changed_healthrules(self, app: dict, healthrules: list):
+        # with a store only new, changed and outdated healthrules are fetched
+        if self.store is None:
+            return healthrules
+
+        changed_healthrules = []
+        for healthrule in healthrules:
+            details = self.store.get_details(app["id"], healthrule)
+            if details is None:
+                changed_healthrules.append(healthrule)
+            else:
+                healthrule["details"] = details
+        logging.info(
+            f"Application [{app['name']}] - {len(changed_healthrules)} of {len(healthrules)} HealthRules changed"
+        )
+        return changed_healthrules
+
+    def __load_task(self, task: tuple, stream: bool = False):
+        app, healthrule = task
+        if healthrule is None:
+            return list(self.get_healthrules(app["id"], stream=stream))
+        if self.store is not None:
+            # the store already decided the details changed, skip the cache
+            details = self.get_healthrule(app["id"], healthrule["id"])
+            self.store_cached_healthrule(app["id"], healthrule["id"], details)
+            return details
+        return self.load_healthrule(app["id"], healthrule["id"])
+
+    def load_healthrule(self, app_id: int, health_rule_id: int):
+        details = self.get_cached_healthrule(app_id, health_rule_id)
+        if details is None:
+            details = self.get_healthrule(app_id, health_rule_id)
+            self.store_cached_healthrule(app_id, health_rule_id, details)
+        return details
+
     def get_healthrule(self, app_id: int, health_rule_id: int):
         url = f"/controller/alerting/rest/v1/applications/{app_id}/health-rules/{health_rule_id}"
         try:
@@ -30,6 +136,25 @@ class AppdHealthrules:
             logging.error(f"Failed to load HealthRule: {type(e)}")
             raise e
 
+    def get_healthrule_match(
+        self, app: dict, healthrule: dict, metrics: list, metric_match: str
+    ):
+        if self.store is not None:
+            match = self.store.get_match(
+                app["id"], healthrule["id"], metrics, metric_match
+            )
+            if match is not None:
+                return match
+
+        match = self.check_healthrule_by_metrics(
+            app, healthrule["details"], metrics, metric_match
+        )
+        if self.store is not None:
+            self.store.put_match(
+                app["id"], healthrule["id"], metrics, metric_match, match
+            )
+        return match
+
     def check_healthrule_by_metrics(
         self,
         app: dict,
@@ -43,6 +168,30 @@ class AppdHealthrules:
             "informationPoint": False,
         }
 
+        metric_paths, error = self.get_metric_paths(healthrule)
+        matcher = get_metric_matcher(metrics, metric_match)
+        for metric_path, criterias in metric_paths:
+            if matcher.match(metric_path):
+                for criteria in criterias:
+                    match_result[criteria] = True
+
+        if error is not None:
+            click.echo(f'Healthrule in application {app["name"]}: Invalid JSON', error)
+
+        return match_result
+
+    def get_metric_paths(self, healthrule: dict):
+        # returns ((metric path, (criteria, ...)), ...) and the error, which
+        # stopped the extraction, the paths found until then are still checked
+        metric_paths = {}
+        error = None
+
+        def add(metric_path: str, criteria: str):
+            if metric_path is not None:
+                criterias = metric_paths.setdefault(metric_path, [])
+                if criteria not in criterias:
+                    criterias.append(criteria)
+
         try:
             if (
                 healthrule["affects"]["affectedEntityType"] == "INFORMATION_POINTS"
@@ -51,72 +200,34 @@ class AppdHealthrules:
                 ]
                 == "SPECIFIC_INFORMATION_POINTS"
             ):
-                affected_information_points = healthrule["affects"][
-                    "affectedInformationPoints"
-                ]["informationPoints"]
-                match_result["informationPoint"] = self.__check_affected_entities(
-                    affected_information_points,
-                    metrics,
-                    metric_match,
-                )
-
-            if healthrule["evalCriterias"]["criticalCriteria"] is not None:
-                match_result["criticalCriteria"] = self.__check_criteria(
-                    healthrule["evalCriterias"]["criticalCriteria"],
-                    metrics,
-                    metric_match,
-                )
-
-            if healthrule["evalCriterias"]["warningCriteria"] is not None:
-                match_result["warningCriteria"] = self.__check_criteria(
-                    healthrule["evalCriterias"]["warningCriteria"],
-                    metrics,
-                    metric_match,
-                )
-        except Exception as e:
-            click.echo(f'Healthrule in application {app["name"]}: Invalid JSON', e)
+                for entity in healthrule["affects"]["affectedInformationPoints"][
+                    "informationPoints"
+                ]:
+                    add(entity, "informationPoint")
 
-        return match_result
+            for criteria in ["criticalCriteria", "warningCriteria"]:
+                if healthrule["evalCriterias"][criteria] is not None:
+                    for metric_path in self.__get_criteria_metric_paths(
+                        healthrule["evalCriterias"][criteria]
+                    ):
+                        add(metric_path, criteria)
+        except Exception as e:
+            error = e
 
-    def __check_affected_entities(
-        self, entities: dict, metrics: list, metric_match: str
-    ):
-        for entity in entities:
-            for metric in metrics:
-                if self.__check_match(entity, metric, metric_match):
-                    return True
+        return (
+            tuple(
+                (metric_path, tuple(criterias))
+                for metric_path, criterias in metric_paths.items()
+            ),
+            error,
+        )
 
-    def __check_criteria(self, criteria: dict, metrics: list, metric_match: str):
+    def __get_criteria_metric_paths(self, criteria: dict):
         for condition in criteria["conditions"]:
-            for metric in metrics:
-                if condition["evalDetail"]["evalDetailType"] == "METRIC_EXPRESSION":
-                    for expression_variable in condition["evalDetail"][
-                        "metricExpressionVariables"
-                    ]:
-                        if self.__check_match(
-                            expression_variable["metricPath"], metric, metric_match
-                        ):
-                            return True
-                elif condition["evalDetail"]["evalDetailType"] == "SINGLE_METRIC":
-                    if self.__check_match(
-                        condition["evalDetail"]["metricPath"], metric, metric_match
-                    ):
-                        return True
-
-    def __check_match(self, input: str, metric: str, metric_match: str):
-        if metric is None:
-            return True
-        if input is None:
-            return False
-
-        if metric_match == "exact":
-            return input == metric
-        elif metric_match == "contains":
-            return re.search(metric, input, re.IGNORECASE)
-        elif metric_match == "contains_case_sensitive":
-            return re.search(metric, input)
-        elif metric_match == "regex":
-            metric_regex = re.compile(metric)
-            return metric_regex.match(input)
-        else:
-            return False
+            if condition["evalDetail"]["evalDetailType"] == "METRIC_EXPRESSION":
+                for expression_variable in condition["evalDetail"][
+                    "metricExpressionVariables"
+                ]:
+                    yield expression_variable["metricPath"]
+            elif condition["evalDetail"]["evalDetailType"] == "SINGLE_METRIC":
+                yield condition["evalDetail"]["metricPath"]
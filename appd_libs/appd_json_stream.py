@@ -0,0 +1,70 @@
+import codecs
+import json
+
+JSON_WHITESPACE = " \t\n\r"
+
+
+def iter_json_array(chunks):
+    decoder = json.JSONDecoder()
+    text_decoder = codecs.getincrementaldecoder("utf-8")()
+    buffer = ""
+    position = 0
+    state = "start"  # start -> value|end -> separator -> value ... -> done
+
+    for chunk in chunks:
+        buffer = buffer[position:] + text_decoder.decode(chunk)
+        position = 0
+
+        while True:
+            while position < len(buffer) and buffer[position] in JSON_WHITESPACE:
+                position += 1
+            if position >= len(buffer):
+                break
+
+            if state == "start":
+                if buffer[position] != "[":
+                    raise ValueError("Expected a JSON array")
+                position += 1
+                state = "value_or_end"
+            elif state == "separator":
+                if buffer[position] == ",":
+                    position += 1
+                    state = "value"
+                elif buffer[position] == "]":
+                    return
+                else:
+                    raise ValueError(f"Unexpected character {buffer[position]!r}")
+            elif state == "value_or_end" and buffer[position] == "]":
+                return
+            else:
+                try:
+                    element, end = decoder.raw_decode(buffer, position)
+                except json.JSONDecodeError:
+                    # incomplete element, wait for the next chunk
+                    break
+                if not isinstance(element, (dict, list, str)):
+                    # a number may continue in the next chunk, so it is complete
+                    # only if a separator follows
+                    next_position = end
+                    while (
+                        next_position < len(buffer)
+                        and buffer[next_position] in JSON_WHITESPACE
+                    ):
+                        next_position += 1
+                    if (
+                        next_position >= len(buffer)
+                        or buffer[next_position] not in ",]"
+                    ):
+                        break
+                yield element
+                position = end
+                state = "separator"
+
+    raise ValueError("Invalid or incomplete JSON array")
+
+
+def iter_json_response(response, chunk_size: int = 64 * 1024):
+    try:
+        yield from iter_json_array(response.iter_content(chunk_size=chunk_size))
+    finally:
+        response.close()
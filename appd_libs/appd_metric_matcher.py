@@ -0,0 +1,78 @@
+import functools
+import re
+
+METRIC_MATCH_MODES = ["contains", "contains_case_sensitive", "exact", "regex"]
+
+
+class AppdMetricMatcher:
+    def __init__(self, metrics, metric_match: str):
+        self.metrics = tuple(metrics)
+        self.metric_match = metric_match
+        self.__results = {}
+
+        if metric_match == "exact":
+            self.__exact = {}
+            for metric in self.metrics:
+                self.__exact.setdefault(metric, []).append(metric)
+        elif metric_match in ["contains", "contains_case_sensitive"]:
+            self.__ignore_case = metric_match == "contains"
+            self.__substrings = [
+                (self.__fold(metric), metric) for metric in self.metrics
+            ]
+            # only a pre-filter: one pass over the input rejects the inputs no
+            # metric can match, the others are still tested for each metric
+            self.__any_substring = re.compile(
+                "|".join(
+                    re.escape(substring)
+                    for substring in sorted(
+                        {substring for substring, _ in self.__substrings},
+                        key=len,
+                        reverse=True,
+                    )
+                )
+            )
+        elif metric_match == "regex":
+            self.__regexes = [(re.compile(metric), metric) for metric in self.metrics]
+
+    def get_matching_metrics(self, input: str):
+        if input is None:
+            return ()
+
+        result = self.__results.get(input)
+        if result is None:
+            result = self.__results[input] = tuple(self.__match(input))
+        return result
+
+    def match(self, input: str):
+        return len(self.get_matching_metrics(input)) > 0
+
+    def __match(self, input: str):
+        if self.metric_match == "exact":
+            return self.__exact.get(input, [])
+        elif self.metric_match in ["contains", "contains_case_sensitive"]:
+            if len(self.__substrings) == 0:
+                return []
+            folded_input = self.__fold(input)
+            if self.__any_substring.search(folded_input) is None:
+                return []
+            return [
+                metric
+                for substring, metric in self.__substrings
+                if substring in folded_input
+            ]
+        elif self.metric_match == "regex":
+            return [metric for regex, metric in self.__regexes if regex.match(input)]
+        else:
+            return []
+
+    def __fold(self, value: str):
+        return value.casefold() if self.__ignore_case else value
+
+
+@functools.lru_cache(maxsize=None)
+def _get_metric_matcher(metrics: tuple, metric_match: str):
+    return AppdMetricMatcher(metrics, metric_match)
+
+
+def get_metric_matcher(metrics, metric_match: str) -> AppdMetricMatcher:
+    return _get_metric_matcher(tuple(metrics), metric_match)
@@ -0,0 +1,82 @@
+import contextlib
+import csv
+import json
+import sys
+
+OUTPUT_FORMATS = ["text", "json", "jsonl", "csv"]
+
+BUFFER_SIZE = 64 * 1024
+
+
+class AppdRecordWriter:
+    def __init__(self, file, fields: list):
+        self.file = file
+        self.fields = fields
+
+    def close(self):
+        self.file.flush()
+
+
+class AppdJsonLinesWriter(AppdRecordWriter):
+    def write(self, record: dict):
+        self.file.write(json.dumps(record, separators=(",", ":")))
+        self.file.write("\n")
+
+
+class AppdJsonWriter(AppdRecordWriter):
+    # one JSON array, written record by record instead of dumped at the end
+    def __init__(self, file, fields: list):
+        super().__init__(file, fields)
+        self.__separator = "[\n"
+
+    def write(self, record: dict):
+        self.file.write(self.__separator)
+        self.file.write(json.dumps(record))
+        self.__separator = ",\n"
+
+    def close(self):
+        self.file.write("[]\n" if self.__separator == "[\n" else "\n]\n")
+        super().close()
+
+
+class AppdCsvWriter(AppdRecordWriter):
+    def __init__(self, file, fields: list):
+        super().__init__(file, fields)
+        self.__writer = csv.DictWriter(file, fieldnames=fields, extrasaction="ignore")
+        self.__writer.writeheader()
+
+    def write(self, record: dict):
+        self.__writer.writerow(record)
+
+
+RECORD_WRITERS = {
+    "json": AppdJsonWriter,
+    "jsonl": AppdJsonLinesWriter,
+    "csv": AppdCsvWriter,
+}
+
+
+@contextlib.contextmanager
+def open_record_writer(output_format: str, fields: list):
+    # writes to stdout with a large buffer, bypassing click's styling
+    sys.stdout.flush()
+    try:
+        file = open(
+            sys.stdout.fileno(),
+            "w",
+            buffering=BUFFER_SIZE,
+            encoding="utf-8",
+            newline="",
+            closefd=False,
+        )
+    except (AttributeError, OSError, ValueError):
+        # stdout is not backed by a file descriptor, e.g. when captured
+        file = sys.stdout
+
+    writer = RECORD_WRITERS[output_format](file, fields)
+    try:
+        yield writer
+    finally:
+        writer.close()
+        if file is not sys.stdout:
+            file.close()
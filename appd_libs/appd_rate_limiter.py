@@ -0,0 +1,204 @@
+import logging
+import statistics
+import threading
+import time
+
+CONGESTION_STATUS_CODES = [429, 503]
+# responses per latency window, at least
+LATENCY_WINDOW_SIZE = 10
+# windows, whose median latency makes up the baseline
+LATENCY_BASELINE_WINDOWS = 10
+# windows in a row above the tolerance, which count as overload
+LATENCY_SLOW_WINDOWS = 3
+
+
+class AppdRateLimiter:
+    # token bucket and concurrency limit shared by all requests to a
+    # controller. Both are cut (multiplicative decrease) when the controller
+    # throttles, only the concurrency when the latency stays high, and raised
+    # step by step (additive increase) while the responses are healthy.
+    def __init__(
+        self,
+        concurrency: int,
+        max_rate: float = 0,
+        min_rate: float = 1,
+        rate_increase: float = 1,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 2,
+        adaptive: bool = True,
+        recovery_time: float = 10,
+    ):
+        self.concurrency = float(max(1, concurrency))
+        self.max_rate = max_rate
+        self.min_rate = min_rate
+        # requests per second, None while the rate is not limited
+        self.rate = max_rate if max_rate > 0 else None
+        self.rate_increase = rate_increase
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.adaptive = adaptive
+        # seconds, in which an imposed rate held back no request, after which
+        # it is lifted again, if no rate_limit is configured
+        self.recovery_time = recovery_time
+        self.throughput = 0.0
+        self.backoff_count = 0
+        self.request_count = 0
+
+        self.__condition = threading.Condition()
+        self.__in_flight = 0
+        self.__tokens = 1.0
+        now = time.monotonic()
+        self.__created_at = now
+        self.__refilled_at = now
+        self.__increased_at = now
+        self.__decreased_at = now
+        self.__window_started_at = now
+        self.__window_count = 0
+        self.__latencies = []
+        self.__latency_medians = []
+        self.__slow_windows = 0
+        self.__last_latency = 0.0
+        self.__rate_limited_at = now
+
+    def acquire(self):
+        # blocks until the request may be sent, returns its start time
+        with self.__condition:
+            while True:
+                now = time.monotonic()
+                self.__refill(now)
+                if self.__in_flight >= int(self.concurrency):
+                    self.__condition.wait()
+                elif self.rate is not None and self.__tokens < 1:
+                    self.__rate_limited_at = now
+                    self.__condition.wait((1 - self.__tokens) / self.rate)
+                else:
+                    break
+
+            self.__in_flight += 1
+            if self.rate is not None:
+                self.__tokens -= 1
+            return now
+
+    def release(self, started_at: float, status_codes: list):
+        # status_codes holds the final status and those of retried attempts
+        now = time.monotonic()
+        with self.__condition:
+            limit_reached = self.__in_flight >= int(self.concurrency)
+            self.__in_flight -= 1
+            self.__count(now)
+            self.__last_latency = now - started_at
+
+            if self.adaptive:
+                throttled = any(
+                    status_code in CONGESTION_STATUS_CODES
+                    for status_code in status_codes
+                )
+                if throttled:
+                    # requests sent before the last cut saw the old limits
+                    if started_at > self.__decreased_at:
+                        self.__decrease(now, "throttled")
+                elif self.__is_slow(self.__last_latency):
+                    self.__decrease(now, "slow")
+                else:
+                    self.__increase(now, limit_reached)
+
+            self.__condition.notify_all()
+
+    def get_average_rate(self):
+        with self.__condition:
+            elapsed = time.monotonic() - self.__created_at
+            return self.request_count / elapsed if elapsed > 0 else 0.0
+
+    def __refill(self, now: float):
+        if self.rate is not None:
+            # a burst of up to one second
+            self.__tokens = min(
+                max(1.0, self.rate),
+                self.__tokens + (now - self.__refilled_at) * self.rate,
+            )
+        self.__refilled_at = now
+
+    def __count(self, now: float):
+        self.request_count += 1
+        self.__window_count += 1
+        elapsed = now - self.__window_started_at
+        if elapsed >= 1:
+            current = self.__window_count / elapsed
+            self.throughput = (
+                current if self.throughput == 0 else (self.throughput + current) / 2
+            )
+            self.__window_started_at = now
+            self.__window_count = 0
+
+    def __is_slow(self, latency: float):
+        # the median latency of several windows in a row far above the
+        # baseline, single slow responses don't move the median
+        if self.latency_tolerance <= 0:
+            return False
+        self.__latencies.append(latency)
+        if len(self.__latencies) < max(LATENCY_WINDOW_SIZE, int(self.concurrency)):
+            return False
+
+        median = statistics.median(self.__latencies)
+        self.__latencies = []
+        if (
+            len(self.__latency_medians) > 0
+            and median > min(self.__latency_medians) * self.latency_tolerance
+        ):
+            self.__slow_windows += 1
+        else:
+            self.__slow_windows = 0
+        # the baseline follows a lasting change of the controller
+        self.__latency_medians = self.__latency_medians[
+            -(LATENCY_BASELINE_WINDOWS - 1) :
+        ] + [median]
+
+        if self.__slow_windows >= LATENCY_SLOW_WINDOWS:
+            self.__slow_windows = 0
+            return True
+        return False
+
+    def __decrease(self, now: float, reason: str):
+        self.backoff_count += 1
+        self.__decreased_at = now
+        self.__increased_at = now
+        # relative to what is in use, a limit above it wouldn't slow down
+        self.concurrency = max(
+            1.0,
+            min(self.concurrency, self.__in_flight + 1) * self.decrease_factor,
+        )
+        if reason == "throttled":
+            # only the controller refusing requests fixes a rate, a higher
+            # latency is already answered by fewer requests in flight
+            rate = self.rate
+            if rate is None:
+                # before the first full second, the rate is estimated from latency
+                rate = self.throughput or (self.__in_flight + 1) / max(
+                    self.__last_latency, 0.001
+                )
+            self.rate = max(self.min_rate, rate * self.decrease_factor)
+            self.__tokens = min(self.__tokens, 1.0)
+        rate = f"{self.rate:.1f}/s" if self.rate is not None else "none"
+        logging.info(
+            f"Back off, {reason}: concurrency {self.concurrency:.1f}, rate {rate}"
+        )
+
+    def __increase(self, now: float, limit_reached: bool):
+        # about one more request in flight per round of responses, as long as
+        # the limit holds them back
+        if limit_reached:
+            self.concurrency += 1 / self.concurrency
+        if self.rate is not None:
+            if (
+                self.max_rate <= 0
+                and now - self.__rate_limited_at >= self.recovery_time
+                and now - self.__decreased_at >= self.recovery_time
+            ):
+                # without a configured limit, the imposed rate is lifted once
+                # it no longer holds back the requests
+                self.rate = None
+            else:
+                self.rate += self.rate_increase * (now - self.__increased_at)
+                if self.max_rate > 0:
+                    self.rate = min(self.max_rate, self.rate)
+        self.__increased_at = now
@@ -1,5 +1,32 @@
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 import logging
+import random
+import threading
+import time
+
+from .appd_rate_limiter import AppdRateLimiter
+from .appd_stats import AppdStats
+from .appd_token_cache import AppdTokenCache
+
+RETRY_STATUS_CODES = [429, 500, 502, 503, 504]
+
+
+class AppdRetry(Retry):
+    # full jitter, so concurrent workers don't retry in lockstep
+    def get_backoff_time(self):
+        backoff = super().get_backoff_time()
+        return random.uniform(0, backoff) if backoff > 0 else 0
+
+
+def get_retried_status_codes(response: requests.Response):
+    # the adapter retries 429 and 5xx responses, which are only visible in
+    # the retry history of the final response
+    retries = getattr(response.raw, "retries", None)
+    if retries is None:
+        return []
+    return [attempt.status for attempt in retries.history if attempt.status is not None]
 
 
 class AppdRestApi:
@@ -9,26 +36,68 @@ class AppdRestApi:
         client_id: str,
         client_secret: str,
         controller_certificate=None,
+        pool_connections: int = 10,
+        pool_maxsize: int = 10,
+        max_retries: int = 3,
+        backoff_factor: float = 0.5,
+        token_refresh_margin: float = 60,
+        token_cache: AppdTokenCache = None,
+        rate_limiter: AppdRateLimiter = None,
+        timeout: float = 60,
+        stats: AppdStats = None,
     ):
         self.controller_url = controller_url
         self.client_id = client_id
         self.client_secret = client_secret
         self.client_token = None
+        self.client_token_expires_at = None
+        self.token_refresh_margin = token_refresh_margin
+        self.token_cache = token_cache
+        self.__token_lock = threading.Lock()
         self.controller_certificate = controller_certificate
+        self.request_count = 0
+        self.__request_count_lock = threading.Lock()
+        self.rate_limiter = rate_limiter
+        # seconds to connect and between two reads, not for the whole response
+        self.timeout = (min(10, timeout), timeout) if timeout > 0 else None
+        self.stats = stats
 
-    def get(self, url, params=None, data=None, json=None, headers=None):
-        return self.execute("GET", url, params, data, json, headers)
+        retry = AppdRetry(
+            total=max_retries,
+            backoff_factor=backoff_factor,
+            status_forcelist=RETRY_STATUS_CODES,
+            allowed_methods=["GET", "POST"],
+            respect_retry_after_header=True,
+            raise_on_status=False,
+        )
+        adapter = HTTPAdapter(
+            pool_connections=pool_connections,
+            pool_maxsize=pool_maxsize,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def get(self, url, params=None, data=None, json=None, headers=None, stream=False):
+        return self.execute("GET", url, params, data, json, headers, stream)
 
     def post(self, url, params=None, data=None, json=None, headers=None):
         return self.execute("POST", url, params, data, json, headers)
 
-    def execute(self, method, url, params=None, data=None, json=None, headers=None):
-        if self.client_token == None:
-            self.client_token = self.get_bearer_token()
-
+    def execute(
+        self,
+        method,
+        url,
+        params=None,
+        data=None,
+        json=None,
+        headers=None,
+        stream=False,
+    ):
         request_url = f"{self.controller_url}{url}"
         request_headers = {} if headers == None else headers
-        request_headers["Authorization"] = f"Bearer {self.client_token}"
+        request_headers["Authorization"] = f"Bearer {self.get_token()}"
 
         return self.__execute_request(
             method,
@@ -37,6 +106,7 @@ class AppdRestApi:
             data=data,
             json=json,
             headers=request_headers,
+            stream=stream,
         )
 
     def __execute_request(
@@ -47,17 +117,10 @@ class AppdRestApi:
         data=None,
         json=None,
         headers=None,
+        stream=False,
         auth_retry=True,
     ):
-        response = requests.request(
-            method,
-            url=url,
-            params=params,
-            data=data,
-            json=json,
-            headers=headers,
-            verify=self.controller_certificate,
-        )
+        response = self.__send(method, url, params, data, json, headers, stream)
 
         if (
             auth_retry
@@ -65,9 +128,21 @@ class AppdRestApi:
             and "invalid access token" in response.text
         ):
             logging.info("Retry - Generate new Token")
-            self.client_token = self.get_bearer_token()
-            headers["Authorization"] = f"Bearer {self.client_token}"
-            response = requests.request(
+            rejected_token = headers["Authorization"][len("Bearer ") :]
+            headers["Authorization"] = f"Bearer {self.renew_token(rejected_token)}"
+            response = self.__send(method, url, params, data, json, headers, stream)
+
+        return response
+
+    def __send(self, method, url, params, data, json, headers, stream):
+        self.__count_request()
+        if self.rate_limiter is not None:
+            started_at = self.rate_limiter.acquire()
+        status_codes = []
+        started = time.perf_counter()
+        response = None
+        try:
+            response = self.session.request(
                 method,
                 url=url,
                 params=params,
@@ -75,9 +150,71 @@ class AppdRestApi:
                 json=json,
                 headers=headers,
                 verify=self.controller_certificate,
+                stream=stream,
+                timeout=self.timeout,
             )
+            status_codes = [response.status_code] + get_retried_status_codes(response)
+            return response
+        finally:
+            if self.rate_limiter is not None:
+                self.rate_limiter.release(started_at, status_codes)
+            self.__record(url, started, response, stream)
 
-        return response
+    def __record(self, url, started, response, stream=False):
+        if self.stats is None:
+            return
+        latency = time.perf_counter() - started
+        if response is None:
+            self.stats.record_request(url, started, latency, None, None)
+            return
+        if stream:
+            # the body isn't read yet
+            size = response.headers.get("Content-Length")
+            size = int(size) if size is not None and size.isdigit() else None
+        else:
+            size = len(response.content)
+        self.stats.record_request(url, started, latency, response.status_code, size)
+
+    def get_token(self):
+        if self.__token_is_fresh():
+            return self.client_token
+
+        with self.__token_lock:
+            # another thread may have refreshed the token while we waited
+            if not self.__token_is_fresh():
+                self.__refresh_token()
+            return self.client_token
+
+    def renew_token(self, rejected_token: str):
+        with self.__token_lock:
+            if self.client_token == rejected_token:
+                self.__refresh_token(use_cache=False)
+            return self.client_token
+
+    def __token_is_fresh(self):
+        if self.client_token is None:
+            return False
+        if self.client_token_expires_at is None:
+            return True
+        return time.time() < self.client_token_expires_at - self.token_refresh_margin
+
+    def __refresh_token(self, use_cache: bool = True):
+        if use_cache and self.token_cache is not None:
+            cached = self.token_cache.load(
+                self.controller_url, self.client_id, self.token_refresh_margin
+            )
+            if cached is not None:
+                self.client_token, self.client_token_expires_at = cached
+                return
+
+        self.client_token = self.get_bearer_token()
+        if self.token_cache is not None:
+            self.token_cache.store(
+                self.controller_url,
+                self.client_id,
+                self.client_token,
+                self.client_token_expires_at,
+            )
 
     def get_bearer_token(self):
         url = f"{self.controller_url}/controller/api/oauth/access_token"
@@ -85,13 +222,30 @@ class AppdRestApi:
         data = f"grant_type=client_credentials&client_id={self.client_id}&client_secret={self.client_secret}"
 
         try:
-            response = requests.post(
-                url, data=data, headers=headers, verify=self.controller_certificate
-            )
+            self.__count_request()
+            started = time.perf_counter()
+            response = None
+            try:
+                response = self.session.post(
+                    url,
+                    data=data,
+                    headers=headers,
+                    verify=self.controller_certificate,
+                    timeout=self.timeout,
+                )
+            finally:
+                self.__record(url, started, response)
             data = response.json()
             token = data["access_token"]
+            self.client_token_expires_at = (
+                time.time() + data["expires_in"] if "expires_in" in data else None
+            )
             logging.info(f"Generated Token: {token[:20]}...")
             return token
         except Exception as e:
             logging.error(f"Failed to authenticate: {type(e)}")
             raise e
+
+    def __count_request(self):
+        with self.__request_count_lock:
+            self.request_count += 1
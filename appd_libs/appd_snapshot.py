@@ -0,0 +1,130 @@
+import gzip
+import json
+import logging
+import time
+
+from .appd_applications import AppdApplications
+from .appd_dashboards import AppdDashboards
+from .appd_healthrules import AppdHealthrules
+
+SNAPSHOT_FORMAT_VERSION = 1
+
+
+class AppdSnapshot:
+    def __init__(
+        self,
+        controller_url: str = None,
+        created_at: float = None,
+        applications: list = None,
+        internal_applications: list = None,
+        dashboards: list = None,
+        dashboards_details: list = None,
+        healthrules: dict = None,
+        healthrules_details: dict = None,
+    ):
+        self.controller_url = controller_url
+        self.created_at = time.time() if created_at is None else created_at
+        self.applications = [] if applications is None else applications
+        self.internal_applications = (
+            [] if internal_applications is None else internal_applications
+        )
+        self.dashboards = [] if dashboards is None else dashboards
+        self.dashboards_details = (
+            [] if dashboards_details is None else dashboards_details
+        )
+        # keyed by "<application id>" and "<application id>/<healthrule id>"
+        self.healthrules = {} if healthrules is None else healthrules
+        self.healthrules_details = (
+            {} if healthrules_details is None else healthrules_details
+        )
+
+    @classmethod
+    def load(cls, path: str):
+        try:
+            with gzip.open(path, "rt", encoding="utf-8") as file:
+                data = json.load(file)
+        except Exception as e:
+            logging.error(f"Failed to load snapshot {path}: {type(e)}")
+            raise e
+
+        if data.get("format_version") != SNAPSHOT_FORMAT_VERSION:
+            raise ValueError(f"Unsupported snapshot format in {path}")
+        del data["format_version"]
+        return cls(**data)
+
+    def save(self, path: str):
+        data = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "controller_url": self.controller_url,
+            "created_at": self.created_at,
+            "applications": self.applications,
+            "internal_applications": self.internal_applications,
+            "dashboards": self.dashboards,
+            "dashboards_details": self.dashboards_details,
+            "healthrules": self.healthrules,
+            "healthrules_details": self.healthrules_details,
+        }
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            json.dump(data, file, separators=(",", ":"))
+
+
+class AppdSnapshotApplications(AppdApplications):
+    def __init__(self, snapshot: AppdSnapshot):
+        super().__init__(None)
+        self.snapshot = snapshot
+
+    def get_applications_and_internal(self, internal_application_ids: list = None):
+        # the internal applications are those of the snapshot's controller,
+        # not the ones configured for the current run
+        return (
+            list(self.snapshot.applications),
+            list(self.snapshot.internal_applications),
+        )
+
+    def get_applications(self):
+        # callers append to the returned list
+        return list(self.snapshot.applications)
+
+    def get_application(self, id: int):
+        for application in (
+            self.snapshot.internal_applications + self.snapshot.applications
+        ):
+            if application["id"] == id:
+                return application
+        logging.error(f"Application [{id}] is not part of the snapshot")
+        raise ValueError("Invalid Application Id")
+
+
+class AppdSnapshotDashboards(AppdDashboards):
+    def __init__(self, snapshot: AppdSnapshot):
+        super().__init__(None)
+        self.snapshot = snapshot
+        self.__dashboards_details = {
+            details["id"]: details
+            for details in snapshot.dashboards_details
+            if "id" in details
+        }
+
+    def get_dashboards(self, stream: bool = False):
+        return self.snapshot.dashboards
+
+    def load_dashboard(self, dashboard: dict):
+        return self.get_dashboard(dashboard["id"])
+
+    def get_dashboard(self, id: int, version: int = -1):
+        return self.__dashboards_details.get(id, {})
+
+
+class AppdSnapshotHealthrules(AppdHealthrules):
+    def __init__(self, snapshot: AppdSnapshot):
+        super().__init__(None)
+        self.snapshot = snapshot
+
+    def get_healthrules(self, app_id: int, stream: bool = False):
+        return self.snapshot.healthrules.get(str(app_id), [])
+
+    def load_healthrule(self, app_id: int, health_rule_id: int):
+        return self.get_healthrule(app_id, health_rule_id)
+
+    def get_healthrule(self, app_id: int, health_rule_id: int):
+        return self.snapshot.healthrules_details.get(f"{app_id}/{health_rule_id}", {})
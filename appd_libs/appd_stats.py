@@ -0,0 +1,152 @@
+import contextlib
+import re
+import threading
+import time
+import urllib.parse
+
+ENDPOINT_FAMILIES = [
+    ("token", re.compile(r"/controller/api/oauth/access_token$")),
+    ("application_list", re.compile(r"/controller/rest/applications$")),
+    ("application", re.compile(r"/controller/rest/applications/\d+$")),
+    (
+        "dashboard_list",
+        re.compile(r"/controller/restui/dashboards/getAllDashboardsByType/"),
+    ),
+    (
+        "dashboard_detail",
+        re.compile(r"/controller/restui/dashboards/dashboardIfUpdated/"),
+    ),
+    (
+        "healthrule_list",
+        re.compile(r"/controller/alerting/rest/v1/applications/\d+/health-rules$"),
+    ),
+    (
+        "healthrule_detail",
+        re.compile(r"/controller/alerting/rest/v1/applications/\d+/health-rules/\d+$"),
+    ),
+]
+
+PERCENTILES = [50, 95, 99]
+
+
+def get_endpoint_family(url: str):
+    path = urllib.parse.urlsplit(url).path
+    for family, pattern in ENDPOINT_FAMILIES:
+        if pattern.search(path):
+            return family
+    return "other"
+
+
+def get_percentile(sorted_values: list, percentile: int):
+    # nearest rank
+    rank = max(1, -(-len(sorted_values) * percentile // 100))
+    return sorted_values[rank - 1]
+
+
+class AppdStats:
+    # requests and phases of one controller. Recording is cheap, so it's
+    # always on and only reported with --stats.
+    def __init__(self):
+        self.started_at = time.time()
+        self.__started = time.perf_counter()
+        self.__lock = threading.Lock()
+        # (family, start offset, latency, status, size), status None for errors
+        self.__samples = []
+        self.__phases = {}
+        self.__local = threading.local()
+
+    def record_request(
+        self, url: str, started: float, latency: float, status: int, size: int
+    ):
+        sample = (
+            get_endpoint_family(url),
+            started - self.__started,
+            latency,
+            status,
+            size,
+        )
+        with self.__lock:
+            self.__samples.append(sample)
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        # the phases of a thread don't overlap, a nested phase pauses the
+        # outer one
+        stack = getattr(self.__local, "stack", None)
+        if stack is None:
+            stack = self.__local.stack = []
+        now = time.perf_counter()
+        if len(stack) > 0:
+            self.__add_phase(stack[-1][0], now - stack[-1][1])
+        stack.append([name, now])
+        try:
+            yield
+        finally:
+            now = time.perf_counter()
+            _, started = stack.pop()
+            self.__add_phase(name, now - started)
+            if len(stack) > 0:
+                stack[-1][1] = now
+
+    def get_duration(self):
+        return time.perf_counter() - self.__started
+
+    def get_phases(self):
+        with self.__lock:
+            return dict(self.__phases)
+
+    def get_request_summary(self):
+        with self.__lock:
+            samples = list(self.__samples)
+
+        families = {}
+        for sample in samples:
+            families.setdefault(sample[0], []).append(sample)
+        summary = {
+            family: self.__summarize(family_samples)
+            for family, family_samples in families.items()
+        }
+        if len(samples) > 0:
+            summary["total"] = self.__summarize(samples)
+        return summary
+
+    def to_json(self):
+        with self.__lock:
+            samples = list(self.__samples)
+        return {
+            "started_at": self.started_at,
+            "duration": self.get_duration(),
+            "requests": self.get_request_summary(),
+            "phases": self.get_phases(),
+            "samples": [
+                {
+                    "family": family,
+                    "started": started,
+                    "latency": latency,
+                    "status": status,
+                    "size": size,
+                }
+                for family, started, latency, status, size in samples
+            ],
+        }
+
+    def __add_phase(self, name: str, duration: float):
+        with self.__lock:
+            self.__phases[name] = self.__phases.get(name, 0) + duration
+
+    def __summarize(self, samples: list):
+        latencies = sorted(sample[2] for sample in samples)
+        first_started = min(sample[1] for sample in samples)
+        last_finished = max(sample[1] + sample[2] for sample in samples)
+        span = last_finished - first_started
+        summary = {
+            "count": len(samples),
+            "errors": sum(
+                1 for sample in samples if sample[3] is None or sample[3] >= 400
+            ),
+            "bytes": sum(sample[4] for sample in samples if sample[4] is not None),
+            "throughput": len(samples) / span if span > 0 else 0.0,
+        }
+        for percentile in PERCENTILES:
+            summary[f"p{percentile}"] = get_percentile(latencies, percentile)
+        return summary
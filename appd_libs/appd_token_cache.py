@@ -0,0 +1,65 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+# controllers of a fan-out store their tokens in the same file
+_lock = threading.Lock()
+
+
+class AppdTokenCache:
+    def __init__(self, path: str):
+        self.path = os.path.expanduser(path)
+
+    def load(self, controller_url: str, client_id: str, min_validity: float = 0):
+        entry = self.__read().get(self.__key(controller_url, client_id))
+        if entry is None or entry["expires_at"] - min_validity <= time.time():
+            return None
+        logging.debug(f"Loaded token from cache {self.path}")
+        return entry["access_token"], entry["expires_at"]
+
+    def store(self, controller_url: str, client_id: str, access_token: str, expires_at):
+        if expires_at is None:
+            return
+
+        with _lock:
+            self.__store(
+                self.__key(controller_url, client_id), access_token, expires_at
+            )
+
+    def __store(self, key: str, access_token: str, expires_at):
+        entries = self.__read()
+        entries[key] = {
+            "access_token": access_token,
+            "expires_at": expires_at,
+        }
+        # drop tokens that expired in the meantime
+        now = time.time()
+        entries = {k: v for k, v in entries.items() if v["expires_at"] > now}
+
+        try:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as file:
+                json.dump(entries, file)
+            os.replace(tmp_path, self.path)
+        except OSError as e:
+            logging.warning(f"Failed to write token cache {self.path}: {type(e)}")
+
+    def __read(self):
+        try:
+            with open(self.path) as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logging.warning(f"Failed to read token cache {self.path}: {type(e)}")
+            return {}
+
+    def __key(self, controller_url: str, client_id: str):
+        return hashlib.sha256(
+            f"{controller_url.rstrip('/')}|{client_id}".encode()
+        ).hexdigest()
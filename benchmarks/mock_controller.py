@@ -0,0 +1,381 @@
+#!/usr/bin/env python
+
+import click
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+METRICS = [
+    "Overall Application Performance|Calls per Minute",
+    "Overall Application Performance|Average Response Time (ms)",
+    "Overall Application Performance|Errors per Minute",
+    "Business Transaction Performance|Business Transactions|web|/checkout|Calls per Minute",
+    "Business Transaction Performance|Business Transactions|web|/checkout|Errors per Minute",
+    "Application Infrastructure Performance|web|Hardware Resources|CPU|%Busy",
+    "Application Infrastructure Performance|web|JVM|Garbage Collection|GC Time Spent Per Min (ms)",
+    "Backends|Discovered backend call - db|Calls per Minute",
+]
+WIDGET_TYPES = [
+    "TIMESERIES_GRAPH",
+    "PIE",
+    "GAUGE",
+    "METRIC_LABEL",
+    "HEALTH_LIST",
+    "LIST",
+    "ANALYTICS",
+    "TEXT",
+]
+INTERNAL_APPLICATIONS = ["analytics", "db-monitoring", "server-monitoring"]
+
+
+class AppdTenant:
+    # a synthetic controller inventory, the same seed gives the same tenant
+    def __init__(
+        self,
+        applications: int,
+        dashboards: int,
+        widgets: int,
+        rules: int,
+        seed: int = 1,
+    ):
+        self.__random = random.Random(seed)
+        self.applications = [
+            {"id": id, "name": f"app-{id}", "description": ""}
+            for id in range(1, applications + 1)
+        ]
+        self.internal_applications = [
+            {"id": applications + position, "name": name, "description": ""}
+            for position, name in enumerate(INTERNAL_APPLICATIONS, start=1)
+        ]
+        self.dashboards = {
+            id: self.__get_dashboard(id, widgets) for id in range(1, dashboards + 1)
+        }
+        self.healthrules = {
+            app["id"]: {
+                app["id"] * 1000
+                + position: self.__get_healthrule(app["id"] * 1000 + position)
+                for position in range(1, rules + 1)
+            }
+            for app in self.applications + self.internal_applications
+        }
+
+    def __get_app_id(self):
+        return self.__random.choice(self.applications)["id"]
+
+    def __get_dashboard(self, id: int, widgets: int):
+        return {
+            "id": id,
+            "name": f"dashboard-{id}",
+            "version": 1,
+            "modifiedOn": 1700000000000 + id,
+            "widgets": [
+                self.__get_widget(id * 1000 + position, position)
+                for position in range(widgets)
+            ],
+        }
+
+    def __get_widget(self, id: int, position: int):
+        widget = {
+            "id": id,
+            "title": f"widget-{position}" if position > 0 else None,
+            "type": self.__random.choice(WIDGET_TYPES),
+        }
+        if widget["type"] in ["TIMESERIES_GRAPH", "PIE", "GAUGE", "METRIC_LABEL"]:
+            widget["widgetsMetricMatchCriterias"] = [
+                {
+                    "metricMatchCriteria": {
+                        "applicationId": self.__get_app_id(),
+                        "metricExpression": self.__get_metric_expression(),
+                    }
+                }
+                for _ in range(self.__random.randint(1, 3))
+            ]
+        elif widget["type"] == "HEALTH_LIST":
+            widget["applicationId"] = self.__random.choice([0, self.__get_app_id()])
+            widget["entityType"] = "APPLICATION"
+            widget["entityIds"] = [self.__get_app_id()]
+        elif widget["type"] == "LIST":
+            widget["eventFilter"] = {"applicationIds": [self.__get_app_id()]}
+        elif widget["type"] == "ANALYTICS":
+            widget["adqlQueries"] = [
+                f"SELECT count(*) FROM transactions WHERE application = 'app-{self.__get_app_id()}'"
+            ]
+        return widget
+
+    def __get_metric_expression(self):
+        if self.__random.random() < 0.2:
+            return {
+                "type": "BOOLEAN_METRIC_EXPRESSION",
+                "expression1": self.__get_metric_expression(),
+                "expression2": self.__get_metric_expression(),
+            }
+        return {
+            "type": "LEAF_METRIC_EXPRESSION",
+            "metricDefinition": {"logicalMetricName": self.__random.choice(METRICS)},
+        }
+
+    def __get_healthrule(self, id: int):
+        return {
+            "id": id,
+            "name": f"healthrule-{id}",
+            "enabled": True,
+            "affects": {"affectedEntityType": "OVERALL_APPLICATION_PERFORMANCE"},
+            "evalCriterias": {
+                "criticalCriteria": {
+                    "conditions": [
+                        {
+                            "evalDetail": {
+                                "evalDetailType": "SINGLE_METRIC",
+                                "metricPath": self.__random.choice(METRICS),
+                            }
+                        }
+                    ]
+                },
+                "warningCriteria": {
+                    "conditions": [
+                        {
+                            "evalDetail": {
+                                "evalDetailType": "METRIC_EXPRESSION",
+                                "metricExpressionVariables": [
+                                    {"metricPath": self.__random.choice(METRICS)}
+                                    for _ in range(2)
+                                ],
+                            }
+                        }
+                    ]
+                },
+            },
+        }
+
+
+class AppdMockControllerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # headers and body leave in one packet, like from a real controller
+    wbufsize = 64 * 1024
+    disable_nagle_algorithm = True
+
+    ROUTES = [
+        ("GET", re.compile(r"/controller/rest/applications$"), "get_applications"),
+        (
+            "GET",
+            re.compile(r"/controller/rest/applications/(\d+)$"),
+            "get_application",
+        ),
+        (
+            "GET",
+            re.compile(r"/controller/restui/dashboards/getAllDashboardsByType/\w+$"),
+            "get_dashboards",
+        ),
+        (
+            "GET",
+            re.compile(
+                r"/controller/restui/dashboards/dashboardIfUpdated/(\d+)/(-?\d+)$"
+            ),
+            "get_dashboard",
+        ),
+        (
+            "GET",
+            re.compile(
+                r"/controller/alerting/rest/v1/applications/(\d+)/health-rules$"
+            ),
+            "get_healthrules",
+        ),
+        (
+            "GET",
+            re.compile(
+                r"/controller/alerting/rest/v1/applications/(\d+)/health-rules/(\d+)$"
+            ),
+            "get_healthrule",
+        ),
+        ("POST", re.compile(r"/controller/api/oauth/access_token$"), "get_token"),
+    ]
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.__handle("GET")
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        self.__handle("POST")
+
+    def __handle(self, method: str):
+        path = self.path.split("?", 1)[0]
+        self.server.count_request(path)
+        self.server.wait()
+        for route_method, pattern, name in self.ROUTES:
+            match = pattern.match(path)
+            if route_method == method and match is not None:
+                status, data = getattr(self, name)(
+                    *[int(group) for group in match.groups()]
+                )
+                break
+        else:
+            status, data = 404, {"error": "not found"}
+
+        body = b"" if data is None else json.dumps(data).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def get_token(self):
+        return 200, {"access_token": "benchmark-token", "expires_in": 3600}
+
+    def get_applications(self):
+        return 200, self.server.tenant.applications
+
+    def get_application(self, id: int):
+        tenant = self.server.tenant
+        return 200, [
+            app
+            for app in tenant.applications + tenant.internal_applications
+            if app["id"] == id
+        ]
+
+    def get_dashboards(self):
+        return 200, [
+            {
+                "id": dashboard["id"],
+                "name": dashboard["name"],
+                "version": dashboard["version"],
+                "modifiedOn": dashboard["modifiedOn"],
+            }
+            for dashboard in self.server.tenant.dashboards.values()
+        ]
+
+    def get_dashboard(self, id: int, version: int):
+        dashboard = self.server.tenant.dashboards.get(id)
+        if dashboard is None:
+            return 404, {"error": "not found"}
+        if dashboard["version"] == version:
+            return 204, None
+        return 200, dashboard
+
+    def get_healthrules(self, app_id: int):
+        healthrules = self.server.tenant.healthrules.get(app_id, {})
+        return 200, [
+            {"id": rule["id"], "name": rule["name"], "enabled": rule["enabled"]}
+            for rule in healthrules.values()
+        ]
+
+    def get_healthrule(self, app_id: int, healthrule_id: int):
+        healthrule = self.server.tenant.healthrules.get(app_id, {}).get(healthrule_id)
+        if healthrule is None:
+            return 404, {"error": "not found"}
+        return 200, healthrule
+
+
+class AppdMockController(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(
+        self,
+        tenant: AppdTenant,
+        port: int = 0,
+        latency: float = 0,
+        jitter: float = 0,
+    ):
+        super().__init__(("127.0.0.1", port), AppdMockControllerHandler)
+        self.tenant = tenant
+        self.latency = latency
+        self.jitter = jitter
+        self.__counts = {}
+        self.__lock = threading.Lock()
+        self.__thread = None
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}"
+
+    def wait(self):
+        # seconds, like the round trip and processing time of a controller
+        delay = self.latency + random.uniform(0, self.jitter)
+        if delay > 0:
+            time.sleep(delay)
+
+    def count_request(self, path: str):
+        with self.__lock:
+            self.__counts[path] = self.__counts.get(path, 0) + 1
+
+    def pop_request_counts(self):
+        with self.__lock:
+            counts, self.__counts = self.__counts, {}
+        return counts
+
+    def start(self):
+        self.__thread = threading.Thread(target=self.serve_forever, daemon=True)
+        self.__thread.start()
+        return self
+
+    def stop(self):
+        self.shutdown()
+        self.server_close()
+
+
+@click.command()
+@click.option("--port", type=int, default=8090, show_default=True)
+@click.option(
+    "--applications", type=click.IntRange(min=1), default=50, show_default=True
+)
+@click.option(
+    "--dashboards", type=click.IntRange(min=0), default=200, show_default=True
+)
+@click.option(
+    "--widgets",
+    help="widgets per dashboard",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--rules",
+    help="healthrules per application",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--latency",
+    help="milliseconds per request",
+    type=click.FloatRange(min=0),
+    default=20,
+    show_default=True,
+)
+@click.option(
+    "--jitter",
+    help="up to this many milliseconds more",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option("--seed", type=int, default=1, show_default=True)
+def mock_controller(
+    port, applications, dashboards, widgets, rules, latency, jitter, seed
+):
+    """This command serves a synthetic tenant like an AppD controller"""
+
+    tenant = AppdTenant(applications, dashboards, widgets, rules, seed)
+    controller = AppdMockController(tenant, port, latency / 1000, jitter / 1000)
+    healthrules = sum(len(rules) for rules in tenant.healthrules.values())
+    click.echo(
+        f"Serving {applications} Applications, {dashboards} Dashboards and {healthrules} HealthRules on {controller.url}"
+    )
+    click.echo(
+        f"Internal application ids {', '.join(str(app['id']) for app in tenant.internal_applications)}"
+    )
+    try:
+        controller.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        controller.server_close()
+
+
+if __name__ == "__main__":
+    mock_controller()
@@ -0,0 +1,324 @@
+#!/usr/bin/env python
+
+import click
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+from mock_controller import AppdMockController, AppdTenant
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SCRIPT = os.path.join(ROOT, "appd-dependency-check.py")
+sys.path.insert(0, ROOT)
+
+from appd_libs.appd_stats import get_endpoint_family  # noqa: E402
+
+CONFIG = """[controller]
+url = {url}
+client_id = benchmark@tenant
+client_secret = benchmark
+parallelism = {parallelism}
+
+[applications]
+analytics_application_id = {internal_ids[0]}
+db_mon_application = {internal_ids[1]}
+sim_application_id = {internal_ids[2]}
+cache_ttl = 0
+
+[cache]
+directory = {directory}/cache
+
+[incremental]
+directory = {directory}/store
+"""
+
+# name -> (command, endpoint family of the matched items)
+CASES = {
+    "dashboards by application": (
+        ["dashboards", "--app-name", "app-1", "--app-name", "app-2"],
+        "dashboard_detail",
+    ),
+    "dashboards by metric": (
+        ["dashboards", "--metric", "Calls per Minute"],
+        "dashboard_detail",
+    ),
+    "healthrules by metric": (
+        ["healthrules", "--metric", "Calls per Minute"],
+        "healthrule_detail",
+    ),
+    "healthrules by application": (
+        ["healthrules", "--app-name", "app-1", "--metric", "Errors"],
+        "healthrule_detail",
+    ),
+}
+
+
+@click.command()
+@click.option(
+    "--applications", type=click.IntRange(min=2), default=50, show_default=True
+)
+@click.option(
+    "--dashboards", type=click.IntRange(min=0), default=200, show_default=True
+)
+@click.option(
+    "--widgets",
+    help="widgets per dashboard",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--rules",
+    help="healthrules per application",
+    type=click.IntRange(min=0),
+    default=10,
+    show_default=True,
+)
+@click.option(
+    "--latency",
+    help="milliseconds per request of the mock controller",
+    type=click.FloatRange(min=0),
+    default=20,
+    show_default=True,
+)
+@click.option(
+    "--jitter",
+    help="up to this many milliseconds more per request",
+    type=click.FloatRange(min=0),
+    default=0,
+    show_default=True,
+)
+@click.option(
+    "--parallelism",
+    help="controller:parallelism of the runs",
+    type=click.IntRange(min=1),
+    default=8,
+    show_default=True,
+)
+@click.option(
+    "--runs",
+    help="number of runs per case",
+    type=click.IntRange(min=1),
+    default=3,
+    show_default=True,
+)
+@click.option(
+    "--case",
+    "case_names",
+    help="run only this case, all by default",
+    type=click.Choice(list(CASES)),
+    multiple=True,
+)
+@click.option(
+    "--option",
+    "options",
+    help="add this option to every command, e.g. --option=--async",
+    multiple=True,
+)
+@click.option(
+    "--json",
+    "json_path",
+    help="also write the report to this file",
+    type=click.Path(dir_okay=False, writable=True),
+)
+@click.option(
+    "--compare",
+    "compare_path",
+    help="show the change against this earlier report",
+    type=click.Path(exists=True, dir_okay=False),
+)
+def search(
+    applications,
+    dashboards,
+    widgets,
+    rules,
+    latency,
+    jitter,
+    parallelism,
+    runs,
+    case_names,
+    options,
+    json_path,
+    compare_path,
+):
+    """This command measures dashboards and healthrules against a mock controller"""
+
+    tenant = AppdTenant(applications, dashboards, widgets, rules)
+    controller = AppdMockController(
+        tenant, latency=latency / 1000, jitter=jitter / 1000
+    ).start()
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "revision": get_revision(),
+        "python": platform.python_version(),
+        "tenant": {
+            "applications": applications,
+            "dashboards": dashboards,
+            "widgets": widgets,
+            "rules": rules,
+            "latency_ms": latency,
+            "jitter_ms": jitter,
+        },
+        "parallelism": parallelism,
+        "options": list(options),
+        "runs": runs,
+        "cases": {},
+    }
+
+    try:
+        with tempfile.TemporaryDirectory() as directory:
+            with open(os.path.join(directory, "config.ini"), "w") as file:
+                file.write(
+                    CONFIG.format(
+                        url=controller.url,
+                        parallelism=parallelism,
+                        internal_ids=[
+                            app["id"] for app in tenant.internal_applications
+                        ],
+                        directory=directory,
+                    )
+                )
+
+            for name in case_names or CASES:
+                arguments, family = CASES[name]
+                samples = [
+                    run(directory, arguments + list(options), controller)
+                    for _ in range(runs)
+                ]
+                report["cases"][name] = summarize(arguments, family, samples)
+                print_case(name, report["cases"][name])
+    finally:
+        controller.stop()
+
+    if compare_path is not None:
+        with open(compare_path) as file:
+            print_comparison(report, json.load(file))
+
+    if json_path is not None:
+        with open(json_path, "w") as file:
+            json.dump(report, file, indent=2)
+
+
+def run(directory, arguments, controller: AppdMockController):
+    stats_path = os.path.join(directory, "stats.json")
+    controller.pop_request_counts()
+
+    started_at = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, SCRIPT, "--stats-json", stats_path] + arguments,
+        cwd=directory,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+    # wait4 reports the resource usage of this child only
+    _, status, usage = os.wait4(process.pid, 0)
+    runtime = time.perf_counter() - started_at
+    process.returncode = os.waitstatus_to_exitcode(status)
+    if process.returncode != 0:
+        raise click.ClickException(
+            f"{' '.join(arguments)} exited with {process.returncode}"
+        )
+
+    requests = {}
+    for path, count in controller.pop_request_counts().items():
+        family = get_endpoint_family(path)
+        requests[family] = requests.get(family, 0) + count
+
+    with open(stats_path) as file:
+        stats = json.load(file)["controllers"]["default"]
+
+    return {
+        "runtime": runtime,
+        # kilobytes on linux
+        "peak_rss_mb": usage.ru_maxrss / 1024,
+        "requests": requests,
+        "phases": stats["phases"],
+    }
+
+
+def summarize(arguments, family, samples):
+    runtimes = [sample["runtime"] for sample in samples]
+    requests = samples[-1]["requests"]
+    items = requests.get(family, 0)
+    # parsing and matching, without waiting for the controller
+    matching_seconds = statistics.median(
+        sample["phases"].get("parse", 0) + sample["phases"].get("match", 0)
+        for sample in samples
+    )
+    return {
+        "command": arguments,
+        "runtime_ms": {
+            "min": min(runtimes) * 1000,
+            "median": statistics.median(runtimes) * 1000,
+            "max": max(runtimes) * 1000,
+        },
+        "requests": {**requests, "total": sum(requests.values())},
+        "peak_rss_mb": max(sample["peak_rss_mb"] for sample in samples),
+        "phases": {
+            phase: statistics.median(
+                sample["phases"].get(phase, 0) for sample in samples
+            )
+            for phase in samples[-1]["phases"]
+        },
+        "matching": {
+            "items": items,
+            "seconds": matching_seconds,
+            "per_second": items / matching_seconds if matching_seconds > 0 else None,
+        },
+    }
+
+
+def print_case(name, case):
+    matching = case["matching"]
+    per_second = (
+        f"{matching['per_second']:9.0f}/s"
+        if matching["per_second"] is not None
+        else "        -"
+    )
+    click.echo(
+        f"{name:<28} median {case['runtime_ms']['median']:8.1f} ms  requests {case['requests']['total']:6}  peak rss {case['peak_rss_mb']:6.1f} MB  matching {matching['items']:6} items {per_second}"
+    )
+
+
+def print_comparison(report, baseline):
+    click.echo(
+        f"Compared to {baseline.get('revision')} from {baseline.get('created_at')}"
+    )
+    if baseline.get("tenant") != report["tenant"]:
+        click.echo("The tenants differ, the results are not comparable", err=True)
+    for name, case in report["cases"].items():
+        base = baseline["cases"].get(name)
+        if base is None:
+            continue
+        click.echo(
+            f"{name:<28} runtime {get_change(case['runtime_ms']['median'], base['runtime_ms']['median'])}  requests {get_change(case['requests']['total'], base['requests']['total'])}  peak rss {get_change(case['peak_rss_mb'], base['peak_rss_mb'])}"
+        )
+
+
+def get_change(value, base):
+    if not base:
+        return "      -"
+    return f"{(value - base) / base * 100:+6.1f}%"
+
+
+def get_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+if __name__ == "__main__":
+    search()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+import click
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+SCRIPT = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "appd-dependency-check.py",
+)
+
+CONFIG = """[controller]
+url = http://localhost:1
+client_id = benchmark@tenant
+client_secret = benchmark
+
+[cache]
+directory = {directory}/cache
+
+[incremental]
+directory = {directory}/store
+"""
+
+
+@click.command()
+@click.option(
+    "--runs",
+    help="number of runs per case",
+    type=click.IntRange(min=1),
+    default=20,
+    show_default=True,
+)
+@click.option(
+    "--json",
+    "json_path",
+    help="also write the results to this file",
+    type=click.Path(dir_okay=False, writable=True),
+)
+def startup(runs, json_path):
+    """This command measures the startup time of appd-dependency-check"""
+
+    cases = {
+        "python": [sys.executable, "-c", "pass"],
+        "--help": [sys.executable, SCRIPT, "--help"],
+        "dashboards --help": [sys.executable, SCRIPT, "dashboards", "--help"],
+        "healthrules --help": [sys.executable, SCRIPT, "healthrules", "--help"],
+        # dispatches into a command, which reads the config but never
+        # connects to the controller
+        "cache clear": [sys.executable, SCRIPT, "cache", "clear"],
+    }
+
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        with open(os.path.join(directory, "config.ini"), "w") as file:
+            file.write(CONFIG.format(directory=directory))
+
+        for name, command in cases.items():
+            samples = [run(command, directory) for _ in range(runs)]
+            results[name] = {
+                "runs": runs,
+                "min_ms": min(samples) * 1000,
+                "median_ms": statistics.median(samples) * 1000,
+                "max_ms": max(samples) * 1000,
+            }
+            click.echo(
+                f"{name:<20} min {results[name]['min_ms']:7.1f} ms  median {results[name]['median_ms']:7.1f} ms  max {results[name]['max_ms']:7.1f} ms"
+            )
+
+    if json_path is not None:
+        with open(json_path, "w") as file:
+            json.dump(results, file, indent=2)
+
+
+def run(command, directory):
+    started_at = time.perf_counter()
+    subprocess.run(
+        command,
+        cwd=directory,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+        check=True,
+    )
+    return time.perf_counter() - started_at
+
+
+if __name__ == "__main__":
+    startup()